@@ -6,21 +6,34 @@ import sys
 from enum import IntEnum
 from typing import Any, Callable
 
-import click
-import typer
 from str_enum import StrEnum
 
+# click and typer are imported where used, so importing Style is cheap
+
 
 def bell():
     sys.stdout.write("\a")
     sys.stdout.flush()
 
 
-def run(function: Callable[..., Any]) -> Any:
-    """ TODO """
+def run(function: Callable[..., Any], *commands: Callable[..., Any]) -> Any:
+    """
+    Run function as a typer command line app.
+
+    With commands, function runs when no command is named
+    and each command becomes a subcommand named after its function.
+    function then takes a typer.Context and returns early if ctx.invoked_subcommand.
+    """
+    import typer  # pylint: disable=import-outside-toplevel
+
     app = typer.Typer(add_completion=False)
-    command = app.command()
-    command(function)
+    if commands:
+        app.callback(invoke_without_command=True)(function)
+        for command in commands:
+            app.command()(command)
+    else:
+        command = app.command()
+        command(function)
     app()
 
 
@@ -85,22 +98,32 @@ class Style:
         )
 
     def __call__(self, text):
+        import click  # pylint: disable=import-outside-toplevel
+
         return click.style(text, **self.style)
 
     def echo(self, text="", **kw):
         """ TODO """
+        import click  # pylint: disable=import-outside-toplevel
+
         click.echo(self(text), **kw)
 
     def prompt(self, text="", **kw):
         """ TODO """
+        import click  # pylint: disable=import-outside-toplevel
+
         return click.prompt(self(text), **kw)
 
     def confirm(self, text="", **kw):
         """ TODO """
+        import click  # pylint: disable=import-outside-toplevel
+
         return click.confirm(self(text), **kw)
 
     def pause(self, text="", **kw):
         """ TODO """
+        import click  # pylint: disable=import-outside-toplevel
+
         return click.pause(self(text), **kw)
 
 
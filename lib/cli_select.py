@@ -1,12 +1,28 @@
 #!/usr/bin/env python
 
-""" TODO """
+"""
+Pick one of a list of options at the terminal
 
-from typing import List, Optional
+select numbers every option and asks for one.
+pick narrows the options as a search is typed, best matches first,
+so it stays usable with thousands of options.
+"""
 
-from cli import Style
+import heapq
+import shutil
+import sys
+from typing import List, Optional, Sequence, Tuple
+
+from cli import Key, Style
 from typer import echo
 
+PICK_LIMIT = 10  # matches shown at once
+
+UP_KEYS = ("\x1b[A", "\xe0H")
+DOWN_KEYS = ("\x1b[B", "\xe0P", chr(Key.TAB))
+ENTER_KEYS = (chr(Key.ENTER), chr(Key.ENTER_2))
+BACKSPACE_KEYS = (chr(Key.BACKSPACE), chr(Key.BACKSPACE_2))
+
 
 def select(
     options: list, title: str = "", prompt: str = "Select", style: Style = None
@@ -34,8 +50,182 @@ def select(
         echo(f"Error: {selected} is out of range")
 
 
+def score(query: str, key: str) -> Optional[int]:
+    """
+    How well casefolded key matches query, lower is better, None for no match
+
+    0 key starts with query, 1 a word of key does, 2 key contains query,
+    3 key holds the characters of query in order.
+    """
+
+    at = key.find(query)
+    if at == 0:
+        return 0
+    if at > 0:
+        word_start = any(
+            key.startswith(query, index + 1)
+            for index, char in enumerate(key)
+            if not char.isalnum()
+        )
+        return 1 if word_start else 2
+    chars = iter(key)
+    if all(char in chars for char in query):
+        return 3
+    return None
+
+
+class Matcher:
+    """
+    Options matching a growing query
+
+    Every match of a query is a match of the query without its last
+    character, so typing narrows the previous matches rather than
+    searching all options again, and deleting restores them.
+    """
+
+    def __init__(self, options: Sequence):
+        self.keys = [str(option).casefold() for option in options]
+        self.query = ""
+        self._candidates: List[List[int]] = [list(range(len(options)))]
+
+    def type(self, text: str) -> None:
+        """ Extend the query with text """
+        for char in text.casefold():
+            self.query += char
+            self._candidates.append(
+                [
+                    index
+                    for index in self._candidates[-1]
+                    if score(self.query, self.keys[index]) is not None
+                ]
+            )
+
+    def delete(self) -> None:
+        """ Drop the last character of the query """
+        if self.query:
+            self.query = self.query[:-1]
+            self._candidates.pop()
+
+    def matches(self, limit: int) -> Tuple[List[int], int]:
+        """ Indexes of the best limit matches, best first, and the match count """
+        candidates = self._candidates[-1]
+        if not self.query:
+            return candidates[:limit], len(candidates)
+        best = heapq.nsmallest(
+            limit,
+            candidates,
+            key=lambda index: (score(self.query, self.keys[index]), index),
+        )
+        return best, len(candidates)
+
+
+def pick(
+    options: Sequence,
+    title: str = "",
+    prompt: str = "Select",
+    style: Style = None,
+    limit: int = PICK_LIMIT,
+) -> Optional[int]:
+    """
+    Index of the option picked by typing part of it, None if cancelled
+
+    Matches narrow as each key is typed; up, down and tab move the
+    highlight, enter picks it and escape cancels.  Without a terminal the
+    search is read a line at a time and the matches numbered.
+    """
+
+    if not options:
+        return None
+    style = style or Style()
+    if title:
+        echo(title)
+    if not (sys.stdin.isatty() and sys.stdout.isatty()):
+        return _pick_lines(options, prompt, style, limit)
+
+    import click  # pylint: disable=import-outside-toplevel
+
+    limit = max(1, min(limit, shutil.get_terminal_size().lines - 3))
+    matcher = Matcher(options)
+    highlight = 0
+    while True:
+        shown, count = matcher.matches(limit)
+        highlight = min(highlight, max(len(shown) - 1, 0))
+        _draw(options, shown, count, highlight, matcher.query, prompt, style)
+
+        key = click.getchar()
+        if key in ENTER_KEYS and shown:
+            _clear()
+            echo(f"{style(prompt)}: {options[shown[highlight]]}")
+            return shown[highlight]
+        if key == chr(Key.ESC):
+            _clear()
+            return None
+        if key in UP_KEYS:
+            highlight = max(highlight - 1, 0)
+        elif key in DOWN_KEYS:
+            highlight = min(highlight + 1, len(shown) - 1)
+        elif key in BACKSPACE_KEYS:
+            matcher.delete()
+            highlight = 0
+        elif key.isprintable():
+            matcher.type(key)
+            highlight = 0
+
+
+def _draw(options, shown, count, highlight, query, prompt, style) -> None:
+    """ Draw the search line and the matches below it, leave the cursor after the search """
+
+    _clear()
+    lines = [
+        ("> " if row == highlight else "  ") + str(options[index])
+        for row, index in enumerate(shown)
+    ]
+    if count > len(shown):
+        lines.append(f"  ... {count - len(shown)} more")
+    elif not shown:
+        lines.append("  no match")
+    search = f"{style(prompt)}: {query}"
+    echo(search + "\n" + "\n".join(lines), nl=False)
+    echo(f"\x1b[{len(lines)}A\r{search}", nl=False)
+
+
+def _clear() -> None:
+    """ Erase from the search line down """
+    echo("\r\x1b[J", nl=False)
+
+
+def _pick_lines(options, prompt, style, limit) -> Optional[int]:
+    """ pick reading the search a line at a time """
+
+    keys = [str(option).casefold() for option in options]
+    while True:
+        query = style.prompt(
+            f"{prompt} (part of the name)", default="", show_default=False
+        )
+        query = query.casefold()
+        matches = [
+            index
+            for _, index in sorted(
+                (score(query, key), index)
+                for index, key in enumerate(keys)
+                if score(query, key) is not None
+            )
+        ]
+        if len(matches) == 1:
+            return matches[0]
+        if not matches:
+            echo(f"No match for {query!r}")
+            continue
+        if len(matches) > limit:
+            echo(f"{len(matches)} matches, showing the first {limit}")
+        index = select(
+            [options[index] for index in matches[:limit]], prompt=prompt, style=style
+        )
+        return None if index is None else matches[index]
+
+
 def demo():
-    """ Demonstrate select """
+    """ Demonstrate select and pick """
 
     options = (
         "First shalt thou take out the Holy Pin.",
@@ -51,6 +241,10 @@ def demo():
     if index is not None:
         print(options[index])
 
+    index = pick(options, title="Search for a line", style=Style(fg="green"))
+    if index is not None:
+        print(options[index])
+
 
 if __name__ == "__main__":
     demo()
@@ -1,90 +1,228 @@
 #!/usr/bin/env python
 # pylint: disable=no-member
 
-""" Configuration file class """
-
+"""
+Configuration file class
+
+The file is yaml.  Its top level keys are the default profile and the
+optional profiles key holds named profiles, as for several accounts:
+
+  api_key: ...
+  profiles:
+    work:
+      api_key: ...
+
+Updates are batched into transactions.  Each holds a lock file from its
+start, so the values read inside are current until it commits, and is
+merged into the file and written to a temp file renamed over it.  Processes
+sharing the config neither read a partial file nor lose each other's
+updates, as long as a value read to compute an update is read inside the
+transaction.  Reads outside take no lock, and the parsed file is cached
+until it is replaced or its mtime changes.
+"""
+
+import copy
+import os
 import platform
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-
-# import json
-from typing import Optional
+from typing import ContextManager, Dict, Iterator, List, Optional, Tuple
 
 import yaml
 from cli import Style
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt  # pylint: disable=import-error
+
 msg_style = Style(fg="green")
 
+PROFILES = "profiles"  # key of the named profiles
+
+Stamp = Tuple[int, int, int]  # inode, mtime, size
+
+_parsed: Dict[Path, Tuple[Stamp, dict]] = {}
+_parsed_lock = threading.Lock()
+
 
 def home_path():
     return Path(f"~").expanduser()
 
 
+def read_file(path: Path) -> dict:
+    """
+    Parsed contents of the config file at path, {} if there is none
+
+    The contents are parsed again only when the file has changed,
+    and must not be modified.
+    """
+
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return {}
+    stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _parsed_lock:
+        cached = _parsed.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    with open(path) as input_:
+        contents = yaml.safe_load(input_) or {}
+    with _parsed_lock:
+        _parsed[path] = (stamp, contents)
+    return contents
+
+
+def write_file(path: Path, contents: dict) -> None:
+    """ Replace the file at path by contents, atomically and readable by the user only """
+
+    temp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+    with os.fdopen(
+        os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w"
+    ) as output:
+        output.write(yaml.safe_dump(contents, default_flow_style=False))
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(temp, path)
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """ Hold an exclusive lock on the lock file at path, between processes and threads """
+
+    with open(path, "a+") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        else:
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+            else:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+
 class Config:
     """
     Configuration class.
 
     At construction
-      if config file exists for basename, the file is read into the object.
-      Otherwise, the object is populated by kwarge adn the config file is written.
-
-    Whenever the object is modified, the config file is over-written.
+      if config file exists for basename, it is read for the profile,
+      the default profile when profile is None.
+      Otherwise, the config file is written with the kwargs as the profile.
+      Keys the file lacks take their kwargs values.
+
+    Attributes read the file as last written, by any process.
+    Setting an attribute, or several with set or inside transaction,
+    writes them to the profile at once.
     """
 
-    def __init__(self, basename, **kwargs):
-
-        # config_path = f"{basename}.yaml"  # json"
+    def __init__(self, basename, profile: Optional[str] = None, **kwargs):
 
-        self.__dict__["_data"] = kwargs
+        self.__dict__["_defaults"] = kwargs
+        self.__dict__["_profile"] = profile
+        self.__dict__["_changes"] = None
         self.__dict__["_path"] = self._find_config_file(basename)
 
-        if self._path:
-            self._read()
-        else:
+        if self._path is None:
             self.__dict__["_path"] = self._config_path(basename)
-            self._write()
+        if self._section(read_file(self._path)) is None:
+            with self._lock():
+                if self._section(read_file(self._path)) is None:
+                    self._commit({})
 
     def __getattr__(self, name):
-        assert name in self._data, f"{name} not in config"
-        return self._data[name]
+        assert name in self._defaults, f"{name} not in config"
+        if self._changes and name in self._changes:
+            return self._changes[name]
+        section = self._section(read_file(self._path)) or {}
+        return section.get(name, self._defaults[name])
 
     def __setattr__(self, name, value):
-        assert name in self._data, f"{name} not in config"
-        self._data[name] = value
-        self._write()
+        self.set(**{name: value})
 
     def __delattr__(self, name):
         assert False, "Cannot delete from config"
 
+    @property
+    def path(self) -> Path:
+        """ Path of the config file """
+        return self._path
+
+    @property
+    def profile(self) -> Optional[str]:
+        """ Name of the profile, None for the default one """
+        return self._profile
+
+    def profiles(self) -> List[str]:
+        """ Names of the named profiles in the file """
+        return sorted(read_file(self._path).get(PROFILES) or {})
+
     def set(self, **kwargs):
-        """ TODO """
-        for name, value in kwargs.items():
-            assert name in self._data, f"{name} not in config"
-            self._data[name] = value
-        self._write()
+        """ Set the config values kwargs names in one write """
+        with self.transaction():
+            for name, value in kwargs.items():
+                assert name in self._defaults, f"{name} not in config"
+                self._changes[name] = value
+
+    @contextmanager
+    def transaction(self) -> Iterator["Config"]:
+        """
+        Write the values set inside once, at the end
+
+        The config is locked throughout, so values read inside, as by
+        config.version += 1, are not changed by another process before
+        the write.  Nothing is written if it raises.  Transactions nest.
+        """
+
+        if self._changes is not None:
+            yield self
+            return
+        with self._lock():
+            self.__dict__["_changes"] = {}
+            try:
+                yield self
+                if self._changes:
+                    self._commit(self._changes)
+            finally:
+                self.__dict__["_changes"] = None
+
+    def _section(self, contents: dict) -> Optional[dict]:
+        """ The profile's values in contents, None if it has none """
+        if self._profile is None:
+            return contents or None
+        return (contents.get(PROFILES) or {}).get(self._profile)
+
+    def _lock(self) -> ContextManager[None]:
+        """ Lock of the config file, creating its folder if need be """
 
-    def _write(self):
         output_folder = self._path.parent
         if not output_folder.exists():
-            output_folder.mkdir()
+            output_folder.mkdir(parents=True, exist_ok=True)
             msg_style.echo(f"Created folder {output_folder} to hold your configuration")
+        return file_lock(self._path.with_name(f"{self._path.name}.lock"))
 
-        with open(self._path, "w") as output:
-            output.write(yaml.safe_dump(self._data, default_flow_style=False))
-            # json.dump(self._data, output, sort_keys=True, indent=4)
-
-    def _read(self):
-        with open(self._path) as input:
-            data = yaml.safe_load(input)  # json.load(input)
-            # data = json.load(input)
-
-        # check to make sure keys are the same
-        data_keys = set(data.keys())
-        default_keys = set(self._data.keys())
-        assert (
-            data_keys == default_keys
-        ), f"{self._path} and Config default keys do not match: {(default_keys ^ data_keys)}"
+    def _commit(self, changes: dict) -> None:
+        """ Merge changes into the profile in the file as it is now, under _lock """
 
-        self.__dict__["_data"] = data
+        contents = copy.deepcopy(read_file(self._path))
+        if self._profile is None:
+            section = contents
+        else:
+            profiles = contents.setdefault(PROFILES, {})
+            section = profiles.setdefault(self._profile, {})
+        for name, value in self._defaults.items():
+            section.setdefault(name, value)
+        section.update(changes)
+        write_file(self._path, contents)
 
     @staticmethod
     def _filename(basename) -> str:
@@ -135,6 +273,14 @@ def demo():
     config.version += 1
     print(f"Version is now {config.version}")
 
+    with config.transaction():  # written once
+        config.version += 1
+        config.TOKEN = "0e0ffb5c"
+    print(f"Version is now {config.version}, token {config.TOKEN}")
+
+    work = Config("test", profile="work", version=1, TOKEN="e7a3c0d1")
+    print(f"Profiles {work.profiles()}: work is version {work.version}")
+
 
 if __name__ == "__main__":
     demo()
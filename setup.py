@@ -14,10 +14,11 @@ setup(
     long_description_content_type="text/markdown",
     keywords="trello,oauth,click",
     install_requires=['certifi==2020.12.5', 'chardet==3.0.4', 'click==7.1.2', 'idna==2.10', 'numpy==1.19.4', 'oauthlib==3.1.0', 'pandas==1.2.0', 'py-trello==0.17.1', 'python-dateutil==2.8.1', 'pytz==2020.4', 'pyyaml==5.3.1', 'requests-oauthlib==1.3.0', 'requests==2.25.0', 'six==1.15.0', 'typer==0.3.2', 'urllib3==1.26.2', 'xlsxwriter==1.3.7'],
+    extras_require=dict(parquet=["pyarrow"]),
     # dependency_links="",
     packages=['trellod'],
     data_files=[],
-    python_requires=">=3.6",
+    python_requires=">=3.8",
     entry_points=dict(console_scripts=["trellod=trellod.trellod:main"]),
     url="https://github.com/John-Lee-Cooper/trello-dump/",
     download_url="https://github.com/John-Lee-Cooper/trello-dump/archive/1.0.0.tar.gz",
@@ -0,0 +1,27 @@
+""" Tests of the search index """
+
+from trellod.model import Board
+from trellod.search import SearchIndex
+from trellod.stub_server import synthetic_board
+
+
+def test_card_moved_between_boards(tmp_path):
+    """ A card moved to another board is indexed under it, once """
+
+    source = synthetic_board("a", "http://stub", num_lists=2, num_cards=4)
+    target = synthetic_board("b", "http://stub", num_lists=2, num_cards=4)
+    with SearchIndex(tmp_path / "search.sqlite") as index:
+        index.index_board(Board(source))
+        index.index_board(Board(target))
+
+        card = source["cards"].pop(0)  # moveCardToBoard
+        card.update(idBoard="b", idList=target["lists"][0]["id"], name="Moved card")
+        target["cards"].append(card)
+        for board in (source, target):
+            board["dateLastActivity"] = "2021-01-01T00:00:00.000Z"
+        index.index_board(Board(target))
+        index.index_board(Board(source))
+
+        hits = index.search("Moved card")
+        assert [(hit.card_id, hit.board) for hit in hits] == [(card["id"], "Board b")]
+        assert "8 cards of 2 boards" in index.stats()
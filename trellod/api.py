@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+
+"""
+Trello REST access
+
+Every call the dump makes goes through TrelloApi,
+so the number of requests a dump costs can be reported,
+the request rate can be kept inside Trello's quotas,
+throttled or failed requests can be retried
+and responses for an unchanged board can be served from the cache.
+"""
+
+import threading
+import time
+from typing import Iterator, List, Optional
+
+from trello import TrelloClient
+from trello.exceptions import ResourceUnavailable, Unauthorized
+
+from trellod.cache import ResponseCache
+from trellod.engine import RETRY_STATUS, RateLimiter, retry_delay, trello_limiter
+
+API_URL = "https://api.trello.com/1"
+
+PAGE_LIMIT = 1000  # largest page Trello returns for cards and actions
+
+
+class TrelloApi:
+    """ Issue Trello REST calls through a TrelloClient and count them """
+
+    def __init__(
+        self,
+        client: TrelloClient,
+        limiter: Optional[RateLimiter] = None,
+        retries: int = 5,
+        base_url: str = API_URL,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self.client = client
+        self.cache = cache
+        self.limiter = limiter or trello_limiter()
+        self.retries = retries
+        self.base_url = base_url.rstrip("/")
+        self.request_count = 0
+        self.retry_count = 0
+        self.bytes_received = 0
+        self.warnings: List[str] = []
+        self._lock = threading.Lock()
+
+    def _count(self, retry: bool = False, size: Optional[int] = None) -> None:
+        """ Count a request, a retry, or size bytes of a response body """
+        with self._lock:
+            if retry:
+                self.retry_count += 1
+            elif size is not None:
+                self.bytes_received += size
+            else:
+                self.request_count += 1
+
+    def get(self, path: str, **params):
+        """ GET path from the Trello REST API and return the decoded json """
+
+        client = self.client
+        if client.oauth is None:
+            params.update(key=client.api_key, token=client.api_secret)
+        url = f"{self.base_url}/{path.lstrip('/')}"
+
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            self._count()
+            response = client.http_service.request(
+                "GET",
+                url,
+                params=params,
+                headers={"Accept": "application/json"},
+                auth=client.oauth,
+                proxies=client.proxies,
+            )
+            self._count(size=len(response.content))
+            if response.status_code in RETRY_STATUS and attempt < self.retries:
+                self._count(retry=True)
+                time.sleep(retry_delay(response, attempt))
+                attempt += 1
+                continue
+
+            if response.status_code == 401:
+                raise Unauthorized(f"{response.text} at {url}", response)
+            if response.status_code != 200:
+                raise ResourceUnavailable(f"{response.text} at {url}", response)
+            return response.json()
+
+    def cached_get(self, path: str, version: str, **params):
+        """
+        GET path, served from the cache while version is unchanged
+
+        version is the board's dateLastActivity.
+        """
+
+        if self.cache is None:
+            return self.get(path, **params)
+
+        key = self.cache.key(path, params)
+        data = self.cache.get(key, version)
+        if data is None:
+            data = self.get(path, **params)
+            self.cache.put(key, version, data)
+        return data
+
+    def paginate(
+        self,
+        path: str,
+        version: Optional[str] = None,
+        limit: int = PAGE_LIMIT,
+        **params,
+    ) -> Iterator[dict]:
+        """
+        Yield the items of the collection at path a page at a time
+
+        Pages are requested newest first with a before cursor of the oldest id
+        seen so far, so only one page of json is held at a time.
+        """
+
+        before = None
+        while True:
+            page_params = dict(params, limit=limit)
+            if before is not None:
+                page_params["before"] = before
+            if version is None:
+                page = self.get(path, **page_params)
+            else:
+                page = self.cached_get(path, version, **page_params)
+
+            yield from page
+            if len(page) < limit:
+                return
+
+            oldest = min(item["id"] for item in page)
+            if before is not None and oldest >= before:
+                self.warnings.append(
+                    f"{path} ignored its paging cursor; results may be truncated"
+                )
+                return
+            before = oldest
@@ -6,7 +6,7 @@ Walk user through Oauth process for Trello
 
 import sys
 import webbrowser
-from typing import Dict
+from typing import TYPE_CHECKING, Dict, Optional
 
 from click import clear
 from requests_oauthlib import OAuth1Session
@@ -15,6 +15,9 @@ from requests_oauthlib.oauth1_session import TokenRequestDenied
 from lib.cli import Style
 from lib.dev_null_redirect import DevNullRedirect
 
+if TYPE_CHECKING:
+    from trellod.transport import Transport
+
 err_style = Style(fg="red")
 msg_style = Style(fg="green")
 
@@ -27,10 +30,13 @@ def open_webpage(url: str) -> None:
         webbrowser.open(url, new=0)
 
 
-def authorize(app_name="this app") -> Dict[str, str]:
+def authorize(
+    app_name="this app", transport: Optional["Transport"] = None
+) -> Dict[str, str]:
     """
     Obtain Trello API credentials and put them into your config file.
     The configuration file is put in an appropriate place for your operating system.
+    The OAuth requests go through transport's connection pools when given.
     """
 
     login_url = "https://trello.com"
@@ -68,6 +74,8 @@ def authorize(app_name="this app") -> Dict[str, str]:
     # This is a temporary token that is used for
     # having the user authorize an access token and to sign the request to obtain said access token.
     session = OAuth1Session(client_key=api_key, client_secret=api_secret)
+    if transport is not None:
+        transport.configure(session)
     try:
         response = session.fetch_request_token(request_token_url)
     except TokenRequestDenied:
@@ -115,6 +123,8 @@ def authorize(app_name="this app") -> Dict[str, str]:
         resource_owner_secret=resource_owner_secret,
         verifier=oauth_verifier,
     )
+    if transport is not None:
+        transport.configure(session)
     access_token = session.fetch_access_token(access_token_url)
 
     return dict(
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+
+"""
+Multi-board batch export
+
+Every open board of the member, or those matching board and organization
+filters, is fetched on a shared thread pool through a single TrelloApi,
+so all boards share one global rate budget.  As each board arrives its
+workbook is written in a separate process, so CPU-bound XLSX writing
+does not stall network I/O.
+"""
+
+import multiprocessing
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from trellod.api import TrelloApi
+from trellod.engine import FetchEngine
+from trellod.export import Exporter
+from trellod.fetch import covers, fetch_board_json
+from trellod.model import Board
+
+if TYPE_CHECKING:
+    from trellod.filters import CardFilter
+    from trellod.search import SearchIndex
+
+
+class BoardResult(NamedTuple):
+    """ Outcome of exporting one board """
+
+    board_id: str
+    name: str
+    filename: str
+    cards: int = 0
+    fetch_seconds: float = 0.0
+    write_seconds: float = 0.0
+    error: Optional[str] = None
+
+    def __str__(self) -> str:
+        status = f"FAILED {self.error}" if self.error else self.filename
+        return (
+            f"{self.name[:40]:40} {self.cards:7} cards "
+            f"fetch {self.fetch_seconds:6.2f}s write {self.write_seconds:6.2f}s  {status}"
+        )
+
+
+def list_boards(
+    api: TrelloApi, names: Iterable[str] = (), orgs: Iterable[str] = ()
+) -> List[dict]:
+    """
+    Open boards of the member matching names and orgs
+
+    names and orgs match ids or names; an empty filter matches everything.
+    """
+
+    names, orgs = set(names), set(orgs)
+    boards = api.get(
+        "/members/me/boards",
+        filter="open",
+        fields="name,idOrganization,closed,dateLastActivity",
+    )
+    if orgs:
+        organizations = api.get("/members/me/organizations", fields="name,displayName")
+        org_ids = {
+            org["id"]
+            for org in organizations
+            if orgs & {org["id"], org["name"], org["displayName"]}
+        }
+        boards = [board for board in boards if board.get("idOrganization") in org_ids]
+    if names:
+        boards = [board for board in boards if names & {board["id"], board["name"]}]
+    return boards
+
+
+def board_filenames(
+    boards: List[dict], folder: Path, extension: str = ".xlsx"
+) -> Dict[str, str]:
+    """ Output filename for each board id, made unique where names collide """
+
+    counts: Dict[str, int] = {}
+    for board in boards:
+        counts[board["name"]] = counts.get(board["name"], 0) + 1
+
+    filenames = {}
+    for board in boards:
+        name = board["name"].strip().replace("/", "-")
+        if counts[board["name"]] > 1:
+            name = f"{name} {board['id'][-6:]}"
+        filenames[board["id"]] = str(folder / f"Trello {name}{extension}")
+    return filenames
+
+
+def write_workbook(
+    exporter: Exporter,
+    filename: str,
+    board_json: dict,
+    columns: Tuple[str, ...],
+    card_filter: Optional["CardFilter"] = None,
+) -> float:
+    """ Build the board model and write its columns, return seconds taken """
+    start = time.perf_counter()
+    board = Board(board_json)
+    if card_filter is not None:
+        # pylint: disable=import-outside-toplevel
+        from trellod.filters import filter_board
+
+        filter_board(board, card_filter)
+    exporter.write(filename, board.lists, columns)
+    return time.perf_counter() - start
+
+
+def export_boards(
+    api: TrelloApi,
+    boards: List[dict],
+    folder: Path,
+    exporter: Exporter,
+    workers: int,
+    processes: Optional[int] = None,
+    index: Optional["SearchIndex"] = None,
+    columns: Optional[Tuple[str, ...]] = None,
+    card_filter: Optional["CardFilter"] = None,
+) -> List[BoardResult]:
+    """
+    Fetch boards concurrently and write each workbook in a worker process
+
+    Only the card data columns, or the exporter's default columns, and
+    card_filter read is fetched; the filter applies in the worker process.
+    Each board is added to the search index, if given, unfiltered and the
+    columns hold the indexed text, while its workbook is written.
+    """
+
+    folder.mkdir(parents=True, exist_ok=True)
+    filenames = board_filenames(boards, folder, exporter.extension)
+    fetched = exporter.needs(columns)
+    columns = columns or exporter.columns
+    if card_filter is not None:
+        fetched += card_filter.needs()
+        index = None
+    if index is not None:
+        # pylint: disable=import-outside-toplevel
+        from trellod.search import INDEX_COLUMNS
+
+        if not covers(fetched, INDEX_COLUMNS):
+            index = None
+
+    def fetch(board: dict):
+        start = time.perf_counter()
+        board_json = fetch_board_json(api, board["id"], columns=fetched)
+        return board_json, time.perf_counter() - start
+
+    results: Dict[str, BoardResult] = {}
+    writes: Dict[Future, BoardResult] = {}
+    # writers are started as fetches run, forking then could copy held locks
+    spawn = multiprocessing.get_context("spawn")
+    pool = ProcessPoolExecutor(processes, mp_context=spawn)
+    with FetchEngine(workers) as engine, pool:
+        fetches = {engine.submit(fetch, board): board for board in boards}
+        for future in as_completed(fetches):
+            board = fetches[future]
+            result = BoardResult(board["id"], board["name"], filenames[board["id"]])
+            try:
+                board_json, seconds = future.result()
+            except Exception as error:  # pylint: disable=broad-except
+                results[board["id"]] = result._replace(error=str(error))
+                continue
+            result = result._replace(
+                cards=len(board_json["cards"]), fetch_seconds=seconds
+            )
+            write = pool.submit(
+                write_workbook,
+                exporter,
+                result.filename,
+                board_json,
+                columns,
+                card_filter,
+            )
+            writes[write] = result
+            if index is not None:
+                index.index_board(Board(board_json))
+
+        for future in as_completed(writes):
+            result = writes[future]
+            try:
+                result = result._replace(write_seconds=future.result())
+            except Exception as error:  # pylint: disable=broad-except
+                result = result._replace(error=str(error))
+            results[result.board_id] = result
+
+    return [results[board["id"]] for board in boards]
@@ -0,0 +1,469 @@
+#!/usr/bin/env python
+
+"""
+Offline benchmarks for trellod
+
+  python -m trellod.benchmark [--scale N ...] [--output FILE] [--compare FILE]
+  python -m trellod.benchmark formats [--cards N]
+  python -m trellod.benchmark startup
+  python -m trellod.benchmark memory [--cards N]
+
+The default benchmark starts the local Trello stand-in of trellod.stub_server,
+generates synthetic boards with checklists and image attachments at several
+scales, and runs the dump pipeline against each in a fresh process, recording
+request count, wall time, peak RSS and output size in a json file
+so runs can be compared.
+
+formats compares wall time, peak memory and output size of writing a synthetic
+board with every output backend and with the pandas path through df_to_excel.
+
+startup guards the fast-start path: it reads python -X importtime for
+trellod.trellod, fails if a heavy dependency is imported at startup or the
+import or `trellod --help` exceed their targets.
+"""
+
+import json
+import multiprocessing
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import typer
+from trello import TrelloClient
+
+from lib.cli import Style, run
+from trellod.api import TrelloApi
+from trellod.engine import DEFAULT_WORKERS, FetchEngine
+from trellod.export import EXPORTERS, LIST_HEADER, card_row
+from trellod.fetch import fetch_board
+from trellod.model import Board
+from trellod.stub_server import StubTrello, synthetic_board
+from trellod.trellod import download_images_in_lists
+
+SCALES = (10, 1_000, 10_000, 100_000)
+
+IMPORT_TARGET_MS = 150  # python -c "import trellod.trellod"
+HELP_TARGET_MS = 400  # trellod --help, process start to exit
+HEAVY_MODULES = (
+    "numpy",
+    "pandas",
+    "pyarrow",
+    "requests",
+    "requests_oauthlib",
+    "sqlite3",
+    "trello",
+    "webbrowser",
+    "xlsxwriter",
+    "yaml",
+)
+
+style = Style(fg="green")
+err_style = Style(fg="red")
+
+
+def column_width(df, field_name, max_width=None) -> int:
+    """ Width of the widest value or header of column field_name, at most max_width """
+
+    series = df[field_name]
+    width = max(
+        len(str(series.name)),  # len of column name/header
+        series.astype(str).map(len).max(),  # len of largest item
+    )
+    return width if max_width is None else min(width, max_width)
+
+
+def df_to_excel(df, excel, sheet_name, max_width=60):
+    """
+    Write df to sheet sheet_name of excel, the pandas writer of the baseline
+
+    Columns are sized to their contents, cells wrap in a grey border, unused
+    rows and columns are hidden and the rows get an autofilter.
+    """
+
+    num_rows = len(df.index)
+    num_cols = len(df.columns)
+
+    cell_format = excel.book.add_format(
+        dict(
+            text_wrap=True,
+            align="top",
+            # bg_color="#FFFFDD",
+            border=1,
+            border_color="#808080",
+        )
+    )
+
+    df.to_excel(
+        excel,
+        sheet_name=sheet_name,
+        index=False,
+    )
+    worksheet = excel.sheets[sheet_name]
+
+    # Hide unused cells
+    worksheet.set_default_row(height=None, hide_unused_rows=True)
+    worksheet.set_column(num_cols, 16383, options=dict(hidden=True))
+
+    options = dict(hidden=False)
+    for col, field_name in enumerate(df):  # loop through all columns
+        width = column_width(df, field_name, max_width)
+        worksheet.set_column(col, col, width, cell_format, options)
+
+    worksheet.autofilter(0, 0, num_rows - 1, num_cols - 1)
+
+
+def dump_trello_pandas(filename: str, lists: list) -> None:
+    """ dump_trello built on DataFrames and df_to_excel, for comparison """
+
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    excel = pd.ExcelWriter(
+        filename, engine="xlsxwriter"
+    )  # pylint: disable=abstract-class-instantiated
+
+    data = {
+        list_.name.strip(): pd.Series([card.name.strip() for card in list_.cards])
+        for list_ in lists
+    }
+    df_to_excel(pd.DataFrame(data).fillna(""), excel, "Board")
+
+    for list_ in lists:
+        rows = [card_row(card) for card in list_.cards]
+        df = pd.DataFrame(rows, columns=LIST_HEADER)
+        df_to_excel(df, excel, f"List {list_.name}")
+
+    excel.close()
+
+
+def measure(function: Callable[[], None]) -> Dict[str, float]:
+    """ Run function, return its wall time and peak traced memory """
+
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return dict(seconds=seconds, peak_mb=peak / 2 ** 20)
+
+
+def output_size(path: Path) -> int:
+    """ Size in bytes of file or folder path """
+    if path.is_dir():
+        return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+    return path.stat().st_size
+
+
+def benchmark_formats(num_cards: int = 50_000, num_lists: int = 10) -> None:
+    """ Compare writing a num_cards board with each backend and with pandas """
+
+    board = Board(synthetic_board("bench", "http://localhost", num_lists, num_cards))
+    folder = Path(tempfile.mkdtemp())
+    writers = [(name, exporter) for name, exporter in EXPORTERS.items()]
+    writers.append(("pandas", EXPORTERS["xlsx"]._replace(write=dump_trello_pandas)))
+    for name, exporter in writers:
+        filename = folder / f"{name}{exporter.extension}"
+        try:
+            result = measure(lambda: exporter.write(str(filename), board.lists))
+        except ImportError as error:
+            style.echo(f"{name:>10}: skipped, {error}")
+            continue
+        size = output_size(filename) / 2 ** 20
+        style.echo(
+            f"{name:>10}: {num_cards} cards, {result['seconds']:6.2f}s, "
+            f"peak {result['peak_mb']:7.1f} MiB, file {size:.1f} MiB"
+        )
+
+
+def py_trello_card_json(card: dict, board_id: str) -> dict:
+    """ Synthetic card json with the fields py-trello's Card.from_json reads """
+    return dict(
+        card,
+        idBoard=board_id,
+        idShort=0,
+        url=f"https://trello.com/c/{card['id']}",
+        shortUrl=f"https://trello.com/c/{card['id']}",
+        dueComplete=False,
+        idChecklists=[checklist["id"] for checklist in card["checklists"]],
+        badges=dict(checkItems=sum(len(c["checkItems"]) for c in card["checklists"])),
+        labels=[],
+        dateLastActivity="2020-12-01T00:00:00.000Z",
+        checklists=[
+            dict(
+                checklist,
+                checkItems=[
+                    dict(item, state="incomplete") for item in checklist["checkItems"]
+                ],
+            )
+            for checklist in card["checklists"]
+        ],
+    )
+
+
+def py_trello_graph(text: str) -> list:
+    """ py-trello objects for the board json text, as the first dump_trello held """
+    # pylint: disable=import-outside-toplevel,protected-access
+    import trello
+
+    board_json = json.loads(text)
+    client = TrelloClient(api_key="benchmark")
+    board = trello.Board(client, board_json["id"], name=board_json["name"])
+    lists = {
+        list_["id"]: (trello.List.from_json(board, list_), [])
+        for list_ in board_json["lists"]
+    }
+    for card_json in board_json["cards"]:
+        list_, cards = lists[card_json["idList"]]
+        card = trello.Card.from_json(list_, card_json)
+        card._checklists = [
+            trello.Checklist(client, checklist, trello_card=card.id)
+            for checklist in card_json["checklists"]
+        ]
+        cards.append(card)
+    return list(lists.values())
+
+
+def retained(build: Callable[[], object]) -> Dict[str, float]:
+    """ Memory retained by, and peak memory of building, build's result """
+
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = build()
+        seconds = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return dict(seconds=seconds, retained_mb=current / 2 ** 20, peak_mb=peak / 2 ** 20)
+
+
+def benchmark_memory(num_cards: int = 50_000, num_lists: int = 10) -> None:
+    """ Compare the memory of the board model and of py-trello objects """
+
+    board_json = synthetic_board("bench", "http://localhost", num_lists, num_cards)
+    board_json["cards"] = [
+        py_trello_card_json(card, "bench") for card in board_json["cards"]
+    ]
+    text = json.dumps(board_json)
+    del board_json
+    style.echo(f"{num_cards} cards, {len(text) / 2 ** 20:.1f} MiB of json")
+    for name, build in (
+        ("model", lambda: Board(json.loads(text))),
+        ("py-trello", lambda: py_trello_graph(text)),
+    ):
+        result = retained(build)
+        style.echo(
+            f"{name:>10}: retained {result['retained_mb']:7.1f} MiB, "
+            f"peak {result['peak_mb']:7.1f} MiB, built in {result['seconds']:.2f}s"
+        )
+
+
+def peak_rss() -> int:
+    """ Peak resident set size of this process in bytes """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == "Darwin" else peak * 1024
+
+
+def run_pipeline(
+    api_url: str, board_id: str, format_: str, images: bool, workers: int
+) -> dict:
+    """
+    Run the dump pipeline against the stand-in at api_url
+
+    Called in a fresh process so peak RSS belongs to this board alone.
+    """
+
+    start = time.perf_counter()
+    api = TrelloApi(TrelloClient(api_key="benchmark"), base_url=api_url)
+    exporter = EXPORTERS[format_]
+    folder = Path(tempfile.mkdtemp())
+    filename = folder / f"board{exporter.extension}"
+
+    with FetchEngine(workers) as engine:
+        boards = api.get("/members/me/boards", filter="open", fields="name")
+        board_id = next(board["id"] for board in boards if board["id"] == board_id)
+        board = fetch_board(api, board_id, engine)
+        exporter.write(str(filename), board.lists)
+        if images:
+            download_images_in_lists(board.lists, folder / "images", engine)
+
+    return dict(
+        requests=api.request_count,
+        bytes_received=api.bytes_received,
+        seconds=round(time.perf_counter() - start, 3),
+        peak_rss=peak_rss(),
+        output_size=output_size(filename),
+    )
+
+
+def benchmark_pipeline(
+    scales=SCALES,
+    format_: str = "xlsx",
+    images: bool = False,
+    workers: int = DEFAULT_WORKERS,
+    latency: float = 0.0,
+) -> List[dict]:
+    """ Run the pipeline against a synthetic board of each of scales cards """
+
+    results = []
+    with StubTrello(latency=latency) as server:
+        spawn = multiprocessing.get_context("spawn")
+        for cards in scales:
+            board_id = f"scale{cards}"
+            num_lists = max(1, min(20, cards // 50))
+            server.add_board(board_id=board_id, num_lists=num_lists, num_cards=cards)
+            with ProcessPoolExecutor(1, mp_context=spawn) as pool:
+                result = pool.submit(
+                    run_pipeline, server.api_url, board_id, format_, images, workers
+                ).result()
+            del server.boards[board_id]
+            result = dict(cards=cards, lists=num_lists, format=format_, **result)
+            style.echo(
+                f"{cards:>7} cards: {result['requests']:4} requests "
+                f"{result['seconds']:8.2f}s"
+                f"  rss {result['peak_rss'] / 2 ** 20:7.1f} MiB"
+                f"  output {result['output_size'] / 2 ** 20:7.2f} MiB"
+            )
+            results.append(result)
+    return results
+
+
+def compare(results: List[dict], previous: dict) -> None:
+    """ Print the change of each measurement from a previous results file """
+
+    before = {result["cards"]: result for result in previous["results"]}
+    for result in results:
+        old = before.get(result["cards"])
+        if old is None:
+            continue
+        changes = ", ".join(
+            f"{key} {(result[key] - old[key]) / old[key]:+.0%}"
+            for key in ("requests", "seconds", "peak_rss", "output_size")
+            if old.get(key)
+        )
+        style.echo(f"{result['cards']:>7} cards vs previous: {changes}")
+
+
+def pipeline(
+    ctx: typer.Context,
+    scale: List[int] = typer.Option(
+        list(SCALES), help="Number of cards of a synthetic board, repeatable"
+    ),
+    output: Path = typer.Option(
+        Path("benchmark.json"), help="Json file for the results"
+    ),
+    compare_to: Optional[Path] = typer.Option(
+        None, "--compare", help="Previous results file to compare against"
+    ),
+    format_: str = typer.Option("xlsx", "--format", help="Output format"),
+    images: bool = typer.Option(False, "--images", help="Also download images"),
+    workers: int = typer.Option(DEFAULT_WORKERS, help="Concurrent requests"),
+    latency: float = typer.Option(0.0, help="Seconds the stand-in waits per request"),
+) -> None:
+    """ Benchmark the dump pipeline against synthetic boards """
+
+    if ctx.invoked_subcommand:
+        return
+
+    results = benchmark_pipeline(scale, format_, images, workers, latency)
+    output.write_text(
+        json.dumps(
+            dict(
+                time=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                python=platform.python_version(),
+                workers=workers,
+                latency=latency,
+                results=results,
+            ),
+            indent=2,
+        )
+    )
+    if compare_to is not None:
+        compare(results, json.loads(compare_to.read_text()))
+
+
+def formats(cards: int = typer.Option(50_000, help="Number of cards")) -> None:
+    """ Compare the output backends on a synthetic board """
+    benchmark_formats(cards)
+
+
+def memory(cards: int = typer.Option(50_000, help="Number of cards")) -> None:
+    """ Compare the memory of the board model with py-trello objects """
+    benchmark_memory(cards)
+
+
+def import_times(module: str = "trellod.trellod") -> Dict[str, int]:
+    """ Cumulative import time in microseconds of every module module imports """
+
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def help_time(runs: int = 5) -> float:
+    """ Median seconds for `python -m trellod.trellod --help` to run """
+
+    seconds = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "trellod.trellod", "--help"],
+            capture_output=True,
+            check=True,
+        )
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds)
+
+
+def startup(
+    import_target: int = typer.Option(IMPORT_TARGET_MS, help="Import budget in ms"),
+    help_target: int = typer.Option(HELP_TARGET_MS, help="--help budget in ms"),
+) -> None:
+    """ Check that trellod starts without heavy imports and within its targets """
+
+    times = import_times()
+    total_ms = times.get("trellod.trellod", 0) / 1000
+    slowest = sorted(times.items(), key=lambda item: item[1], reverse=True)[1:6]
+    heavy = sorted(name for name in times if name.split(".")[0] in HEAVY_MODULES)
+    help_ms = help_time() * 1000
+
+    style.echo(f"import trellod.trellod: {total_ms:6.1f} ms (target {import_target})")
+    for name, micros in slowest:
+        style.echo(f"  {name:40} {micros / 1000:6.1f} ms")
+    style.echo(f"trellod --help:         {help_ms:6.1f} ms (target {help_target})")
+
+    failed = False
+    if heavy:
+        err_style.echo(f"heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if total_ms > import_target or help_ms > help_target:
+        err_style.echo("startup is over target")
+        failed = True
+    if failed:
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    run(pipeline, formats, startup, memory)
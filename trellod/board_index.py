@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+"""
+Local index of the member's boards
+
+The board picker starts from one request listing the id, name, closed flag,
+organization and last activity of every board, and one naming the
+organizations, rather than from a full object per board.  The index is kept
+as json next to the config and refetched once it is older than its ttl, so
+accounts with thousands of boards open the picker without waiting on Trello.
+
+resolve finds the board a --board names from the cached index however old
+it is, fetching the index again only when the board is not in it, so a
+repeat headless dump costs no board list request.
+"""
+
+import json
+import re
+import time
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+from trellod.api import TrelloApi
+
+BOARD_FIELDS = "name,closed,idOrganization,dateLastActivity,shortLink"
+DEFAULT_TTL = 3600.0  # seconds an index is used before it is refetched
+
+BOARD_ID = re.compile(r"^[0-9a-f]{24}$")
+SHORT_LINK = re.compile(r"^[0-9A-Za-z]{8}$")
+BOARD_URL = re.compile(r"^https?://trello\.com/b/([0-9A-Za-z]+)")
+
+
+class BoardEntry(NamedTuple):
+    """ What the picker knows of a board """
+
+    id: str
+    name: str
+    closed: bool = False
+    organization: str = ""
+    last_activity: Optional[str] = None
+    short_link: str = ""
+
+    def __str__(self) -> str:
+        return f"{self.name}  [{self.organization}]" if self.organization else self.name
+
+
+def fetch_index(api: TrelloApi) -> List[BoardEntry]:
+    """ Entries for all the member's boards, most recently active first """
+
+    organizations = {
+        org["id"]: org.get("displayName") or org.get("name") or ""
+        for org in api.get("/members/me/organizations", fields="name,displayName")
+    }
+    boards = api.get("/members/me/boards", filter="all", fields=BOARD_FIELDS)
+    entries = [
+        BoardEntry(
+            board["id"],
+            board.get("name") or "",
+            bool(board.get("closed")),
+            organizations.get(board.get("idOrganization"), ""),
+            board.get("dateLastActivity"),
+            board.get("shortLink") or "",
+        )
+        for board in boards
+    ]
+    entries.sort(key=lambda entry: entry.last_activity or "", reverse=True)
+    return entries
+
+
+def find_board(entries: List[BoardEntry], key: str) -> Optional[BoardEntry]:
+    """
+    Entry with the id or short link key, else the open board named key
+
+    Names are compared exactly, then ignoring case; of boards sharing a
+    name the most recently active is found.
+    """
+
+    for entry in entries:
+        if key in (entry.id, entry.short_link):
+            return entry
+    open_ = [entry for entry in entries if not entry.closed]
+    named = [entry for entry in open_ if entry.name == key] or [
+        entry for entry in open_ if entry.name.casefold() == key.casefold()
+    ]
+    return named[0] if named else None
+
+
+class BoardIndex:
+    """ Board entries cached in a json file for ttl seconds """
+
+    def __init__(self, path: Path, ttl: float = DEFAULT_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+
+    def load(self, expire: bool = True) -> Optional[List[BoardEntry]]:
+        """ The cached entries, or None when missing or, if expire, expired """
+        try:
+            with open(self.path, encoding="utf-8") as input_:
+                data = json.load(input_)
+        except (OSError, ValueError):
+            return None
+        if expire and time.time() - data.get("fetched", 0) > self.ttl:
+            return None
+        return [BoardEntry(*entry) for entry in data.get("boards", [])]
+
+    def save(self, entries: List[BoardEntry]) -> None:
+        """ Cache entries as fetched now """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_suffix(".tmp")
+        with open(temp, "w", encoding="utf-8") as output:
+            json.dump(dict(fetched=time.time(), boards=entries), output)
+        temp.replace(self.path)
+
+    def boards(self, api: TrelloApi, refresh: bool = False) -> List[BoardEntry]:
+        """ The cached entries, fetched again when expired or refresh is set """
+        entries = None if refresh else self.load()
+        if entries is None:
+            entries = fetch_index(api)
+            self.save(entries)
+        return entries
+
+    def open_boards(self, api: TrelloApi, refresh: bool = False) -> List[BoardEntry]:
+        """ Entries of the open boards """
+        return [entry for entry in self.boards(api, refresh) if not entry.closed]
+
+    def resolve(self, api: TrelloApi, board: str) -> Optional[BoardEntry]:
+        """
+        Entry of the board with the id, short link, board url or name board
+
+        The cache is used however old, and fetched again only when it does
+        not hold board.  An id, or a short link Trello does not list, is
+        returned as is for the dump to try; None when nothing matches.
+        """
+
+        match = BOARD_URL.match(board)
+        key = match.group(1) if match else board
+        entry = find_board(self.load(expire=False) or [], key)
+        if entry is None and not BOARD_ID.match(key):
+            entry = find_board(self.boards(api, refresh=True), key)
+        if entry is None and (BOARD_ID.match(key) or SHORT_LINK.match(key)):
+            entry = BoardEntry(key, "")
+        return entry
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+"""
+Persistent on-disk cache of Trello API responses
+
+Entries are keyed by endpoint and query parameters and tagged with the
+board's dateLastActivity when stored.  An entry is only served while the
+board's dateLastActivity is unchanged, so re-dumping an unchanged board
+costs the single request needed to read dateLastActivity.
+The cache is capped in size and evicts the least recently used entries.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_used ON responses (used);
+"""
+
+
+class CacheStats(NamedTuple):
+    """ Cache counters for --cache-stats """
+
+    hits: int
+    misses: int
+    entries: int
+    size: int
+
+    def __str__(self) -> str:
+        return (
+            f"cache: {self.hits} hits, {self.misses} misses, "
+            f"{self.entries} entries, {self.size / 1024:.0f} KiB"
+        )
+
+
+class ResponseCache:
+    """ LRU cache of json responses in an sqlite file """
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+    @staticmethod
+    def key(path: str, params: Dict[str, Any]) -> str:
+        """ Cache key for GET path?params, ignoring credentials """
+        query = sorted(
+            (name, str(value))
+            for name, value in params.items()
+            if name not in ("key", "token")
+        )
+        return f"{path}?{json.dumps(query)}"
+
+    def get(self, key: str, version: str) -> Optional[Any]:
+        """ Return the json stored for key if it was stored for version """
+
+        with self.lock:
+            row = self.db.execute(
+                "SELECT body FROM responses WHERE key = ? AND version = ?",
+                (key, version),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.db.execute(
+                "UPDATE responses SET used = ? WHERE key = ?", (time.time(), key)
+            )
+            self.db.commit()
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, version: str, data: Any) -> None:
+        """ Store data for key, tagged with version """
+
+        body = zlib.compress(json.dumps(data).encode())
+        with self.lock:
+            self.db.execute(
+                "REPLACE INTO responses (key, version, body, size, used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, version, body, len(body), time.time()),
+            )
+            self._evict()
+            self.db.commit()
+
+    def _evict(self) -> None:
+        """ Drop least recently used entries until the cache fits max_bytes """
+
+        (total,) = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db.execute(
+            "SELECT key, size FROM responses ORDER BY used"
+        ).fetchall():
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> CacheStats:
+        """ Return hit/miss counters and the current size of the cache """
+        with self.lock:
+            entries, size = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return CacheStats(self.hits, self.misses, entries, size)
+
+    def close(self) -> None:
+        """ Close the cache file """
+        self.db.close()
@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+
+"""
+trellod serve: a long-running dump scheduler
+
+One process keeps one authenticated TrelloApi, with its connection pool and
+rate budget, a shared FetchEngine and a warm index of the member's boards.
+Boards are dumped on the schedule of a yaml file:
+
+  output_dir: ~/trello
+  format: xlsx
+  boards:
+    - board: Roadmap        # name or id
+      every: 3600           # seconds
+    - board: 5f1c0e...
+      every: 600
+      format: csv
+
+A board whose dateLastActivity has not changed since its last dump in the
+same format is skipped; one /members/me/boards request per wake-up checks every board.
+Dumps can also be requested over a local unix socket, one json line each:
+
+  {"command": "dump", "board": "Roadmap", "format": "csv", "force": false}
+  {"command": "status"}
+  {"command": "stop"}
+
+With --webhook-port, Trello webhook callbacks for a board are debounced and
+refresh only the cards their actions touch (trellod.webhook).
+"""
+
+import heapq
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import yaml
+
+from trellod.api import TrelloApi
+from trellod.batch import board_filenames
+from trellod.engine import DEFAULT_WORKERS, FetchEngine
+from trellod.export import EXPORTERS
+from trellod.fetch import fetch_board
+from trellod.model import Board
+from trellod.snapshot import apply_actions, fetch_board_incremental, touched_lists
+
+DISCOVERY_TTL = 60.0  # seconds an on-demand dump trusts the board index
+
+
+class Job(NamedTuple):
+    """ A board dumped every `every` seconds """
+
+    board: str
+    every: float
+    format: str
+
+
+class Schedule(NamedTuple):
+    """ Contents of the schedule file """
+
+    output_dir: Path
+    format: str
+    jobs: List[Job]
+
+
+def load_schedule(path: Path) -> Schedule:
+    """ Read and check a schedule file """
+
+    data = yaml.safe_load(Path(path).read_text()) or {}
+    format_ = data.get("format", "xlsx")
+    jobs = []
+    for entry in data.get("boards", []):
+        job = Job(
+            str(entry["board"]),
+            float(entry.get("every", 3600)),
+            entry.get("format", format_),
+        )
+        if job.format not in EXPORTERS:
+            raise ValueError(f"{path}: {job.board} format {job.format} is unknown")
+        if job.every <= 0:
+            raise ValueError(f"{path}: {job.board} every must be positive")
+        jobs.append(job)
+    output_dir = Path(data.get("output_dir", ".")).expanduser()
+    return Schedule(output_dir, format_, jobs)
+
+
+class Daemon:
+    """ Scheduled and on-demand board dumps sharing one session and rate budget """
+
+    def __init__(
+        self,
+        api: TrelloApi,
+        schedule: Schedule,
+        workers: int = DEFAULT_WORKERS,
+        dumps: int = 2,
+        index_path: Optional[Path] = None,
+        snapshots: Optional[Path] = None,
+    ):
+        self.api = api
+        self.schedule = schedule
+        self.index_path = index_path
+        self.snapshots = snapshots
+        self.engine = FetchEngine(workers)
+        # dumps wait on fetches, so they run on their own pool, not the engine's
+        self.pool = ThreadPoolExecutor(dumps, thread_name_prefix="trellod-dump")
+        self.boards: Dict[str, dict] = {}
+        self.discovered = 0.0
+        # (board id, format): dateLastActivity dumped
+        self.dumped: Dict[Tuple[str, str], str] = {}
+        self.running: Dict[str, threading.Lock] = {}
+        self.history: List[dict] = []
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopping = False
+
+    def discover(self, max_age: float = 0.0) -> Dict[str, dict]:
+        """ Open boards of the member by id, refreshed if older than max_age """
+        with self.lock:
+            if time.monotonic() - self.discovered <= max_age and self.boards:
+                return self.boards
+        boards = self.api.get(
+            "/members/me/boards", filter="open", fields="name,dateLastActivity"
+        )
+        with self.lock:
+            self.boards = {board["id"]: board for board in boards}
+            self.discovered = time.monotonic()
+            return self.boards
+
+    def resolve(self, name_or_id: str, max_age: float = DISCOVERY_TTL) -> dict:
+        """ Board json of the open board with id or name name_or_id """
+        for age in (max_age, 0.0):
+            boards = self.discover(age)
+            if name_or_id in boards:
+                return boards[name_or_id]
+            for board in boards.values():
+                if board["name"] == name_or_id:
+                    return board
+        raise KeyError(f"no open board {name_or_id}")
+
+    def current(self, board: dict) -> dict:
+        """ board with the dateLastActivity Trello has now, not the index's """
+        latest = self.api.get(f"/boards/{board['id']}", fields="dateLastActivity")
+        return dict(board, dateLastActivity=latest["dateLastActivity"])
+
+    def dump(self, board: dict, format_: str, force: bool = False) -> dict:
+        """ Dump board unless it is unchanged since its last dump, return a result """
+
+        board_id = board["id"]
+        activity = board.get("dateLastActivity")
+        result = dict(board=board["name"], id=board_id, format=format_, skipped=True)
+        with self.lock:
+            lock = self.running.setdefault(board_id, threading.Lock())
+        with lock:  # one dump of a board at a time
+            unchanged = activity and self.dumped.get((board_id, format_)) == activity
+            if unchanged and not force:
+                return self._record(result)
+
+            start = time.perf_counter()
+            requests = self.api.request_count
+            columns = EXPORTERS[format_].needs()
+            if self.snapshots is None:
+                trello_board = fetch_board(self.api, board_id, self.engine, columns)
+            else:
+                trello_board = fetch_board_incremental(
+                    self.api, board_id, self.snapshots, self.engine, columns
+                )
+            result.update(self._write(board, trello_board, format_))
+            result.update(
+                seconds=round(time.perf_counter() - start, 3),
+                requests=self.api.request_count - requests,
+            )
+        return self._record(result)
+
+    def _write(self, board: dict, trello_board: Board, format_: str) -> dict:
+        """ Write and index trello_board, return its part of the result """
+        exporter = EXPORTERS[format_]
+        folder = self.schedule.output_dir
+        folder.mkdir(parents=True, exist_ok=True)
+        filename = board_filenames([board], folder, exporter.extension)[board["id"]]
+        exporter.write(filename, trello_board.lists)
+        if self.index_path is not None:
+            # pylint: disable=import-outside-toplevel
+            from trellod.search import SearchIndex
+
+            with SearchIndex(self.index_path) as index:
+                index.index_board(trello_board)
+        with self.lock:
+            self.dumped[board["id"], format_] = trello_board.last_activity or board.get(
+                "dateLastActivity"
+            )
+        return dict(skipped=False, path=str(filename))
+
+    def board_format(self, board: dict) -> str:
+        """ Format of the scheduled job of board, else the schedule's format """
+        for job in self.schedule.jobs:
+            if job.board in (board["id"], board["name"]):
+                return job.format
+        return self.schedule.format
+
+    def refresh(self, board_id: str, actions: List[dict]) -> dict:
+        """ Patch a board with actions delivered by webhooks and rewrite it """
+
+        board = self.resolve(board_id)
+        format_ = self.board_format(board)
+        result = dict(
+            board=board["name"],
+            id=board_id,
+            format=format_,
+            actions=len(actions),
+            lists=len(touched_lists(actions)),
+            skipped=True,
+        )
+        with self.lock:
+            lock = self.running.setdefault(board_id, threading.Lock())
+        with lock:
+            start = time.perf_counter()
+            requests = self.api.request_count
+            folder = self.snapshots or self.schedule.output_dir / "snapshots"
+            columns = EXPORTERS[format_].needs()
+            trello_board = apply_actions(
+                self.api, board_id, folder, actions, self.engine, columns
+            )
+            if trello_board is not None:
+                result.update(self._write(board, trello_board, format_))
+            result.update(
+                seconds=round(time.perf_counter() - start, 3),
+                requests=self.api.request_count - requests,
+            )
+        return self._record(result)
+
+    def _refresh_later(self, board_id: str, actions: List[dict]) -> None:
+        """ Debouncer flush: refresh on the dump pool, recording any failure """
+
+        def refresh():
+            try:
+                self.refresh(board_id, actions)
+            except Exception as error:  # pylint: disable=broad-except
+                self._record(dict(id=board_id, error=str(error)))
+
+        self.pool.submit(refresh)
+
+    def webhooks(
+        self,
+        address: tuple,
+        secret: str,
+        callback_url: str,
+        delay: float = 2.0,
+        max_delay: float = 30.0,
+    ):
+        """ Start a webhook receiver whose debounced actions refresh their boards """
+        # pylint: disable=import-outside-toplevel
+        from trellod.webhook import Debouncer, WebhookServer
+
+        debouncer = Debouncer(self._refresh_later, delay, max_delay)
+        return WebhookServer(address, secret, callback_url, debouncer).start()
+
+    def _record(self, result: dict) -> dict:
+        result["time"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with self.lock:
+            self.history = (self.history + [result])[-100:]
+        return result
+
+    def _run_job(self, job: Job) -> None:
+        """ Dump the board of a due job, recording any failure """
+        try:  # the board index was refreshed when the scheduler woke
+            self.dump(self.resolve(job.board, max_age=float("inf")), job.format)
+        except Exception as error:  # pylint: disable=broad-except
+            self._record(dict(board=job.board, error=str(error)))
+
+    def request(self, message: dict) -> dict:
+        """ Answer a socket request """
+
+        command = message.get("command")
+        if command == "status":
+            with self.lock:
+                return dict(
+                    ok=True,
+                    requests=self.api.request_count,
+                    boards=len(self.boards),
+                    jobs=[job._asdict() for job in self.schedule.jobs],
+                    history=self.history[-20:],
+                )
+        if command == "stop":
+            self.stop()
+            return dict(ok=True)
+        if command == "dump":
+            format_ = message.get("format") or self.schedule.format
+            if format_ not in EXPORTERS:
+                return dict(ok=False, error=f"unknown format {format_}")
+            try:
+                board = self.resolve(str(message.get("board")))
+            except KeyError as error:
+                return dict(ok=False, error=str(error.args[0]))
+            try:  # the index may predate a change made since the last dump
+                board = self.current(board)
+            except Exception as error:  # pylint: disable=broad-except
+                return dict(ok=False, error=str(error))
+            future = self.pool.submit(
+                self.dump, board, format_, bool(message.get("force"))
+            )
+            try:
+                return dict(ok=True, **future.result())
+            except Exception as error:  # pylint: disable=broad-except
+                return dict(ok=False, error=str(error))
+        return dict(ok=False, error=f"unknown command {command}")
+
+    def run(self) -> None:
+        """ Run scheduled dumps until stop() """
+
+        now = time.monotonic()
+        queue = [(now, index, job) for index, job in enumerate(self.schedule.jobs)]
+        heapq.heapify(queue)
+        while not self.stopping:
+            timeout = queue[0][0] - time.monotonic() if queue else None
+            if timeout is None or timeout > 0:
+                self.wake.wait(timeout)
+                self.wake.clear()
+                continue
+            try:  # one request checks dateLastActivity of every due board
+                self.discover()
+            except Exception as error:  # pylint: disable=broad-except
+                self._record(dict(error=f"board discovery failed: {error}"))
+            while queue and queue[0][0] <= time.monotonic():
+                due, index, job = heapq.heappop(queue)
+                self.pool.submit(self._run_job, job)
+                heapq.heappush(
+                    queue, (max(due + job.every, time.monotonic()), index, job)
+                )
+
+    def stop(self) -> None:
+        """ Stop the scheduler loop """
+        self.stopping = True
+        self.wake.set()
+
+    def close(self) -> None:
+        """ Wait for running dumps and release the pools """
+        self.pool.shutdown(wait=True)
+        self.engine.close()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """ One json request line in, one json response line out """
+
+    def handle(self):
+        daemon: Daemon = self.server.daemon
+        try:
+            message = json.loads(self.rfile.readline())
+            response = daemon.request(message)
+        except (ValueError, AttributeError) as error:
+            response = dict(ok=False, error=f"bad request: {error}")
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class SocketServer(socketserver.ThreadingUnixStreamServer):
+    """ Unix socket, readable by its owner only, answering Daemon requests """
+
+    daemon_threads = True
+
+    def __init__(self, path: Path, daemon: Daemon):
+        path = Path(path)
+        if path.exists():
+            if ping(path):
+                raise RuntimeError(f"trellod serve is already listening on {path}")
+            path.unlink()
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(str(path), RequestHandler)
+        finally:
+            os.umask(old_umask)
+        self.path = path
+        self.daemon = daemon
+
+    def start(self) -> "SocketServer":
+        """ Serve on a background thread """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """ Stop serving and remove the socket """
+        self.shutdown()
+        self.server_close()
+        self.path.unlink(missing_ok=True)
+
+
+def send(path: Path, message: dict, timeout: Optional[float] = None) -> dict:
+    """ Send a request to the daemon listening on path and return its response """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(str(path))
+        client.sendall(json.dumps(message).encode() + b"\n")
+        with client.makefile("rb") as response:
+            return json.loads(response.readline())
+
+
+def ping(path: Path) -> bool:
+    """ Whether a daemon answers on path """
+    try:
+        return send(path, dict(command="status"), timeout=2.0).get("ok", False)
+    except (OSError, ValueError):
+        return False
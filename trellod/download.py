@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+"""
+Parallel, resumable, deduplicating attachment downloader
+
+Images are fetched over a keep-alive session of trellod.transport by a worker pool,
+streamed to disk in chunks and stored by content:
+
+  <folder>/objects/<sha[:2]>/<sha256>.<ext>   one file per distinct content
+  <folder>/partial/<attachment_id>.part        interrupted downloads, resumed
+  <folder>/manifest.json                       attachment id, size, hash -> file
+
+Attachments already in the manifest with a matching size and file are skipped,
+and cards sharing an image or a name no longer overwrite each other's files.
+An attachment that fails to download is recorded in failed and the rest go on.
+"""
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+from trellod.engine import FetchEngine
+from trellod.model import Attachment, Card
+from trellod.transport import Transport
+
+CHUNK_SIZE = 256 * 1024
+
+
+def image_extension(attachment: Attachment) -> Optional[str]:
+    """ File extension for an image attachment, None if it is not an image """
+    kind, _, ext = attachment.mime_type.partition("/")
+    if kind != "image" or not ext:
+        return None
+    return "jpg" if ext == "jpeg" else ext
+
+
+class AttachmentStore:
+    """ Content-addressed store of downloaded attachments with a manifest """
+
+    def __init__(self, folder: Path, session: requests.Session = None, auth=None):
+        self.folder = Path(folder)
+        self.session = session or Transport().session()
+        self.auth = auth  # sent only to trello.com hosts, which hold uploaded files
+        self.manifest_path = self.folder / "manifest.json"
+        self.manifest: Dict[str, dict] = self._load_manifest()
+        self.lock = threading.Lock()
+        self.downloaded = 0
+        self.skipped = 0
+        self.failed: Dict[str, str] = {}  # attachment id: error
+
+    def _load_manifest(self) -> Dict[str, dict]:
+        if self.manifest_path.is_file():
+            return json.loads(self.manifest_path.read_text())["attachments"]
+        return {}
+
+    def save_manifest(self) -> None:
+        """ Write the manifest, with the files of each card """
+        cards: Dict[str, List[str]] = {}
+        for entry in self.manifest.values():
+            cards.setdefault(entry["card"], []).append(entry["path"])
+        self.folder.mkdir(parents=True, exist_ok=True)
+        temp = self.manifest_path.with_suffix(".tmp")
+        temp.write_text(
+            json.dumps(dict(attachments=self.manifest, cards=cards), indent=1)
+        )
+        temp.replace(self.manifest_path)
+
+    def is_present(self, attachment: Attachment) -> bool:
+        """ True if attachment was already downloaded with the same size """
+        entry = self.manifest.get(attachment.id)
+        return (
+            entry is not None
+            and (not attachment.size or entry["size"] == attachment.size)
+            and (self.folder / entry["path"]).is_file()
+        )
+
+    def _auth_for(self, url: str):
+        host = urlparse(url).hostname or ""
+        trello = host == "trello.com" or host.endswith(".trello.com")
+        return self.auth if trello else None
+
+    def _fetch(self, attachment: Attachment) -> Tuple[str, int]:
+        """ Stream attachment into its partial file, return its sha256 and size """
+
+        partial = self.folder / "partial" / f"{attachment.id}.part"
+        partial.parent.mkdir(parents=True, exist_ok=True)
+        offset = partial.stat().st_size if partial.is_file() else 0
+
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with self.session.get(
+            attachment.url,
+            headers=headers,
+            auth=self._auth_for(attachment.url),
+            stream=True,
+        ) as response:
+            if response.status_code != 416:  # 416: partial file is already complete
+                response.raise_for_status()
+                if response.status_code != 206:  # server ignored Range, start over
+                    offset = 0
+                with open(partial, "ab" if offset else "wb") as output:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        output.write(chunk)
+
+        sha = hashlib.sha256()
+        with open(partial, "rb") as input_:
+            for chunk in iter(lambda: input_.read(CHUNK_SIZE), b""):
+                sha.update(chunk)
+        return sha.hexdigest(), partial.stat().st_size
+
+    def download(self, card: Card, attachment: Attachment) -> Optional[str]:
+        """ Download an image attachment of card, return its path in the store """
+
+        ext = image_extension(attachment)
+        if ext is None:
+            return None
+        if self.is_present(attachment):
+            with self.lock:
+                self.skipped += 1
+            return self.manifest[attachment.id]["path"]
+
+        digest, size = self._fetch(attachment)
+        path = f"objects/{digest[:2]}/{digest}.{ext}"
+        target = self.folder / path
+        partial = self.folder / "partial" / f"{attachment.id}.part"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.is_file():  # same content from another card
+            partial.unlink()
+        else:
+            partial.replace(target)
+
+        with self.lock:
+            self.downloaded += 1
+            self.manifest[attachment.id] = dict(
+                card=card.id,
+                card_name=card.name,
+                name=attachment.name,
+                url=attachment.url,
+                sha256=digest,
+                size=size,
+                path=path,
+            )
+        return path
+
+    def _download(self, job: Tuple[Card, Attachment]) -> Optional[str]:
+        card, attachment = job
+        try:
+            return self.download(card, attachment)
+        except (requests.RequestException, OSError) as error:
+            with self.lock:
+                self.failed[attachment.id] = f"{attachment.url}: {error}"
+            return None
+
+    def download_cards(
+        self, cards: Iterable[Card], engine: Optional[FetchEngine] = None
+    ) -> None:
+        """
+        Download the image attachments of cards, concurrently if given an engine
+
+        Failed downloads are recorded in failed.
+        """
+
+        jobs = [(card, attachment) for card in cards for attachment in card.attachments]
+        try:
+            if engine is None:
+                for job in jobs:
+                    self._download(job)
+            else:
+                engine.map(self._download, jobs)
+        finally:
+            self.save_manifest()
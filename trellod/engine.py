@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+"""
+Bounded-concurrency fetch engine
+
+Trello allows 300 requests per 10 seconds per API key
+and 100 requests per 10 seconds per token.
+Requests are spread over a thread pool while a pair of token buckets
+keep the combined request rate inside both quotas.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional
+
+DEFAULT_WORKERS = 8
+
+KEY_QUOTA = (300, 10.0)  # requests per seconds, per API key
+TOKEN_QUOTA = (100, 10.0)  # requests per seconds, per token
+
+RETRY_STATUS = frozenset((429, 500, 502, 503, 504))
+
+
+class TokenBucket:
+    """ Thread-safe token bucket allowing rate tokens every per seconds """
+
+    def __init__(self, rate: int, per: float, capacity: Optional[int] = None):
+        self.rate = rate / per
+        self.capacity = capacity or rate
+        self.tokens = float(self.capacity)
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_time(self) -> float:
+        """ Take a token if one is available, else return seconds until one is """
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self) -> None:
+        """ Block until a token is available and take it """
+        while True:
+            delay = self.wait_time()
+            if not delay:
+                return
+            time.sleep(delay)
+
+
+class RateLimiter:
+    """ Take a token from every bucket before each request """
+
+    def __init__(self, *buckets: TokenBucket):
+        self.buckets = buckets
+
+    def acquire(self) -> None:
+        """ Block until every bucket allows another request """
+        for bucket in self.buckets:
+            bucket.acquire()
+
+
+def trello_limiter(share: float = 1.0) -> RateLimiter:
+    """ Return a limiter sized to share of Trello's per-key and per-token quotas """
+
+    return RateLimiter(
+        *(
+            TokenBucket(max(1, int(rate * share)), per)
+            for rate, per in (KEY_QUOTA, TOKEN_QUOTA)
+        )
+    )
+
+
+def retry_delay(response, attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """ Seconds to wait before retrying response, honoring Retry-After """
+
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is not None:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass  # HTTP-date form, fall back to backoff
+    return min(cap, base * 2 ** attempt)
+
+
+class FetchEngine:
+    """ Run fetch functions on a bounded thread pool """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS):
+        self.workers = max(1, workers)
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="trellod"
+        )
+
+    def map(self, function: Callable, items: Iterable) -> List:
+        """ Return [function(item) for item in items], run concurrently """
+        return list(self.executor.map(function, items))
+
+    def submit(self, function: Callable, *args, **kwargs):
+        """ Schedule function(*args, **kwargs) and return its future """
+        return self.executor.submit(function, *args, **kwargs)
+
+    def close(self) -> None:
+        """ Wait for running fetches and release the pool """
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
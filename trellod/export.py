@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+
+"""
+Output backends
+
+Every backend writes the lists of a board model to a file, one row per card
+with the columns it is given from COLUMNS, by default:
+
+  xlsx     Board summary sheet plus a sheet per list (dump_trello) of LIST_COLUMNS
+  csv      one streaming CSV file of EXPORT_FIELDS rows
+  jsonl    one streaming JSON object per line of EXPORT_FIELDS rows
+  parquet  a folder holding a board table and one columnar table per list
+
+Each Column names the card fields and nested resources it reads, so the
+fetch layer requests only what the written columns use (fetch.fetch_params).
+"""
+
+import csv
+import json
+from itertools import zip_longest
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from trellod.profiling import profiler
+from trellod.xlsx import StreamingWorkbook
+
+EXPORT_FIELDS = (
+    "list",
+    "list_id",
+    "card",
+    "card_id",
+    "description",
+    "todo",
+    "attachments",
+    "due",
+    "last_activity",
+)
+
+LIST_COLUMNS = ("card", "description", "todo", "attachments")
+LIST_HEADER = ("Card", "Description", "Todo", "Attachments")
+
+
+def todo_text(card) -> str:
+    """ Check item names of all the checklists of card, one per line """
+    return "\n".join(
+        "\n".join(item.strip() for item in checklist.items)
+        for checklist in card.checklists
+    )
+
+
+def attachments_text(card) -> str:
+    """ Attachment urls of card, one per line """
+    return "\n".join(attachment.url for attachment in card.attachments)
+
+
+class Column(NamedTuple):
+    """
+    Export column: title, value of a card of a list, and what it is fetched from
+
+    fields are card fields, params nested-resource parameters of the card
+    request and board_params those of the board request.
+    """
+
+    title: str
+    value: Callable
+    fields: Tuple[str, ...] = ()
+    params: Dict[str, str] = {}
+    board_params: Dict[str, str] = {}
+
+
+CHECKLIST_PARAMS = dict(checklists="all", checklist_fields="name,idCard,pos")
+ATTACHMENT_PARAMS = dict(
+    attachments="true", attachment_fields="name,url,mimeType,bytes"
+)
+
+COLUMNS: Dict[str, Column] = dict(
+    list=Column("List", lambda list_, card: list_.name.strip()),
+    list_id=Column("List Id", lambda list_, card: list_.id),
+    card=Column("Card", lambda list_, card: card.name.strip(), ("name",)),
+    card_id=Column("Card Id", lambda list_, card: card.id),
+    description=Column(
+        "Description", lambda list_, card: card.description.strip(), ("desc",)
+    ),
+    todo=Column("Todo", lambda list_, card: todo_text(card), (), CHECKLIST_PARAMS),
+    attachments=Column(
+        "Attachments", lambda list_, card: attachments_text(card), (), ATTACHMENT_PARAMS
+    ),
+    due=Column("Due", lambda list_, card: card.due or "", ("due",)),
+    last_activity=Column(
+        "Last Activity",
+        lambda list_, card: card.last_activity or "",
+        ("dateLastActivity",),
+    ),
+    labels=Column("Labels", lambda list_, card: ", ".join(card.labels), ("labels",)),
+    members=Column(
+        "Members",
+        lambda list_, card: ", ".join(card.members),
+        ("idMembers",),
+        board_params=dict(members="all", member_fields="fullName,username"),
+    ),
+    url=Column("Url", lambda list_, card: card.url, ("url",)),
+    short_url=Column("Short Url", lambda list_, card: card.short_url, ("shortUrl",)),
+    pos=Column("Position", lambda list_, card: str(card.pos), ("pos",)),
+)
+
+
+def parse_columns(text: str) -> Tuple[str, ...]:
+    """ Column names of a comma separated list, ValueError naming unknown ones """
+    names = tuple(name.strip() for name in text.split(",") if name.strip())
+    unknown = [name for name in names if name not in COLUMNS]
+    if unknown or not names:
+        raise ValueError(
+            f"unknown columns {', '.join(unknown)}; choose from {', '.join(COLUMNS)}"
+        )
+    return names
+
+
+def card_row(card) -> tuple:
+    """ Row of a list sheet for card """
+    return (
+        card.name.strip(),
+        card.description.strip(),
+        todo_text(card),
+        attachments_text(card),
+    )
+
+
+def summary_rows(lists) -> Iterator[tuple]:
+    """ Rows of the board sheet: the nth card name of every list """
+    columns = ((card.name.strip() for card in list_.cards) for list_ in lists)
+    return zip_longest(*columns, fillvalue="")
+
+
+def export_rows(lists, columns: Iterable[str] = EXPORT_FIELDS) -> Iterator[dict]:
+    """ One dict of columns per card of lists """
+    values = [(name, COLUMNS[name].value) for name in columns]
+    for list_ in lists:
+        for card in list_.cards:
+            yield {name: value(list_, card) for name, value in values}
+
+
+def dump_trello(
+    filename: str, lists: list, columns: Iterable[str] = LIST_COLUMNS
+) -> None:
+    """ Write a board sheet and a sheet per list in lists to filename """
+
+    header = tuple(COLUMNS[name].title for name in columns)
+    values = [COLUMNS[name].value for name in columns]
+
+    workbook = StreamingWorkbook(filename)
+    with profiler.phase("sheet Board"):
+        names = [list_.name.strip() for list_ in lists]
+        workbook.write_sheet("Board", names, summary_rows(lists))
+
+    for list_ in lists:
+        with profiler.phase(f"sheet List {list_.name}"):
+            rows = (
+                tuple(value(list_, card) for value in values) for card in list_.cards
+            )
+            workbook.write_sheet(f"List {list_.name}", header, rows)
+
+    with profiler.phase("save workbook"):
+        workbook.close()
+
+
+def write_csv(
+    filename: str, lists: list, columns: Iterable[str] = EXPORT_FIELDS
+) -> None:
+    """ Stream the export rows of lists to a CSV file """
+    columns = tuple(columns)
+    with open(filename, "w", newline="", encoding="utf-8") as output:
+        writer = csv.DictWriter(output, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(export_rows(lists, columns))
+
+
+def write_jsonl(
+    filename: str, lists: list, columns: Iterable[str] = EXPORT_FIELDS
+) -> None:
+    """ Stream the export rows of lists to a JSON lines file """
+    with open(filename, "w", encoding="utf-8") as output:
+        for row in export_rows(lists, columns):
+            output.write(json.dumps(row, ensure_ascii=False))
+            output.write("\n")
+
+
+def write_parquet(
+    filename: str, lists: list, columns: Iterable[str] = EXPORT_FIELDS
+) -> None:
+    """ Write folder filename with board.parquet and a parquet table per list """
+
+    try:
+        import pyarrow as pa  # pylint: disable=import-outside-toplevel
+        import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+    except ImportError as error:
+        raise ImportError(
+            "parquet output needs pyarrow: pip install pyarrow"
+        ) from error
+
+    folder = Path(filename)
+    folder.mkdir(parents=True, exist_ok=True)
+    columns = tuple(columns)
+    schema = pa.schema([(field, pa.string()) for field in columns])
+
+    board = dict(list_id=[], list=[], cards=[])
+    for index, list_ in enumerate(lists):
+        board["list_id"].append(list_.id)
+        board["list"].append(list_.name.strip())
+        board["cards"].append(len(list_.cards))
+
+        table_columns: Dict[str, list] = {field: [] for field in columns}
+        for row in export_rows([list_], columns):
+            for field, value in row.items():
+                table_columns[field].append(value)
+        table = pa.Table.from_pydict(table_columns, schema=schema)
+        pq.write_table(table, folder / f"list_{index:03d}.parquet")
+
+    pq.write_table(pa.Table.from_pydict(board), folder / "board.parquet")
+
+
+class Exporter(NamedTuple):
+    """
+    Output backend: file extension, writer and its default columns
+
+    write(filename, lists, columns) writes columns, or the defaults, and
+    also reads the columns named in uses (the board sheet's card names).
+    """
+
+    extension: str
+    write: Callable[..., None]
+    columns: Tuple[str, ...] = EXPORT_FIELDS
+    uses: Tuple[str, ...] = ()
+
+    def needs(self, columns: Optional[Iterable[str]] = None) -> Tuple[str, ...]:
+        """ Every column writing columns, or the defaults, reads """
+        return tuple(columns or self.columns) + self.uses
+
+
+EXPORTERS: Dict[str, Exporter] = dict(
+    xlsx=Exporter(".xlsx", dump_trello, LIST_COLUMNS, ("card",)),
+    csv=Exporter(".csv", write_csv),
+    jsonl=Exporter(".jsonl", write_jsonl),
+    parquet=Exporter(".parquet", write_parquet),
+)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+"""
+Board fetch layer
+
+Pull the lists, cards, checklists and attachments of a board
+with a few nested-resource requests instead of one or more per card.
+Cards are paged with before/limit cursors so no board is too large
+to dump completely and only one page of json is held at a time.  The
+Board built from the pages still holds every card, as the writers read
+the whole board, so memory grows with the board: by the size of the
+compact model, not of its json.
+
+Given the export columns, fetch_params narrows the requests to the card
+fields and nested resources those columns read; a board of card names is a
+header and a page of names per 1000 cards.
+"""
+
+from itertools import chain
+from typing import Iterable, Iterator, Optional, Tuple
+
+from trellod.api import TrelloApi
+from trellod.engine import FetchEngine
+from trellod.export import COLUMNS
+from trellod.model import Board
+
+BOARD_PARAMS = dict(
+    fields="name,dateLastActivity",
+    lists="open",
+    list_fields="name,pos",
+)
+
+CARD_PARAMS = dict(
+    fields="name,desc,idList,pos,due,dateLastActivity",
+    attachments="true",
+    attachment_fields="name,url,mimeType,bytes",
+    checklists="all",
+    checklist_fields="name,idCard,pos",
+)
+
+CARD_STRUCTURE = ("idList", "pos")  # place cards in their lists, in order
+
+
+def fetch_params(columns: Optional[Iterable[str]] = None) -> Tuple[dict, dict]:
+    """
+    (board params, card params) fetching only what columns read
+
+    Without columns, everything the default exports read is fetched.
+    """
+
+    if columns is None:
+        return BOARD_PARAMS, CARD_PARAMS
+    board_params, card_params = dict(BOARD_PARAMS), {}
+    fields = list(CARD_STRUCTURE)
+    for name in columns:
+        column = COLUMNS[name]
+        fields += [field for field in column.fields if field not in fields]
+        card_params.update(column.params)
+        board_params.update(column.board_params)
+    card_params["fields"] = ",".join(fields)
+    return board_params, card_params
+
+
+def covers(fetched: Iterable[str], columns: Iterable[str]) -> bool:
+    """ Whether fetching for the fetched columns gets all the card data columns read """
+    _, have = fetch_params(fetched)
+    _, need = fetch_params(columns)
+    fields = set(have.pop("fields").split(","))
+    return set(need.pop("fields").split(",")) <= fields and all(
+        have.get(name) == value for name, value in need.items()
+    )
+
+
+def board_version(api: TrelloApi, board_id: str) -> Optional[str]:
+    """
+    The board's dateLastActivity when api has a cache, else None
+
+    Responses cached for that activity are reused.
+    """
+    if api.cache is None:
+        return None
+    board = api.get(f"/boards/{board_id}", fields="dateLastActivity")
+    return board["dateLastActivity"]
+
+
+def fetch_header(
+    api: TrelloApi, board_id: str, version: Optional[str], params: dict = None
+) -> dict:
+    """ Fetch the board's name, dateLastActivity and open lists """
+    params = params or BOARD_PARAMS
+    if version is None:
+        return api.get(f"/boards/{board_id}", **params)
+    return api.cached_get(f"/boards/{board_id}", version, **params)
+
+
+def iter_cards(
+    api: TrelloApi, board_id: str, version: Optional[str], params: dict = None
+) -> Iterator[dict]:
+    """ Yield the open cards of the board, with checklists and attachments, by page """
+    return api.paginate(f"/boards/{board_id}/cards", version, **(params or CARD_PARAMS))
+
+
+def fetch_board_json(
+    api: TrelloApi,
+    board_id: str,
+    engine: Optional[FetchEngine] = None,
+    columns: Optional[Iterable[str]] = None,
+) -> dict:
+    """
+    Fetch the json of board board_id with all its open lists and cards
+
+    Only the data columns read is fetched, all of it without columns.
+    """
+
+    version = board_version(api, board_id)
+    board_params, card_params = fetch_params(columns)
+    if engine is None:
+        board_json = fetch_header(api, board_id, version, board_params)
+        board_json["cards"] = list(iter_cards(api, board_id, version, card_params))
+    else:
+        header = engine.submit(fetch_header, api, board_id, version, board_params)
+        cards = list(iter_cards(api, board_id, version, card_params))
+        board_json = header.result()
+        board_json["cards"] = cards
+    return board_json
+
+
+def fetch_board(
+    api: TrelloApi,
+    board_id: str,
+    engine: Optional[FetchEngine] = None,
+    columns: Optional[Iterable[str]] = None,
+) -> Board:
+    """
+    Fetch board board_id with all its open lists and cards
+
+    Pages of cards become Cards as they arrive,
+    so raw json for only one page is held at a time.
+    Only the data columns read is fetched, all of it without columns.
+    """
+
+    version = board_version(api, board_id)
+    board_params, card_params = fetch_params(columns)
+    cards = iter_cards(api, board_id, version, card_params)
+    if engine is None:
+        header = fetch_header(api, board_id, version, board_params)
+    else:  # fetch the first page of cards while the header is fetched
+        first = engine.submit(next, cards, None)
+        header = fetch_header(api, board_id, version, board_params)
+        card = first.result()
+        cards = chain([card], cards) if card is not None else iter(())
+    return Board(header, cards=cards)
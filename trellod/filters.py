@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+
+"""
+Declarative card filters
+
+A filter is a set of terms:
+
+  list=Doing            cards of the lists named, or with the ids, given
+  label=urgent          cards with a label of that name, or color if unnamed
+  member=Ada Lovelace   cards with a member of that full name or id
+  due>=2024-06-01       due on or after, due<2024-07-01 due before
+  activity>=2024-01-01  last active on or after, activity<... before
+  state=archived        open (the default), archived or all cards
+
+Terms of one key are alternatives, terms of different keys must all hold.
+Names compare ignoring case, dates as ISO 8601 text.
+
+fetch_filtered pushes down what Trello can select: the state is the
+/cards/{open,closed,all} filter, and the cards of a list filter are paged
+per list rather than for the whole board.  Labels, members, due dates and
+activity are checked on light pages holding only the fields the filter and
+the scalar columns read.  Descriptions, checklists and attachments are then
+fetched for the matching cards alone: one request per card when few match,
+else re-paging the same cards with those fields and keeping the matches.
+A filter of lists and state alone is fetched in one pass.
+"""
+
+import re
+from itertools import chain
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+from trellod.api import TrelloApi
+from trellod.engine import FetchEngine
+from trellod.fetch import fetch_params
+from trellod.model import Board, Card, TrelloList
+
+STATES = dict(open="open", archived="closed", all="all")  # state: Trello filter
+DETAIL_COLUMNS = ("description", "todo", "attachments")
+DETAIL_LIMIT = 50  # matching cards fetched a request each; more re-page
+
+TERM = re.compile(r"^\s*(\w+)\s*(>=|<|=)\s*(.*?)\s*$")
+
+Window = Tuple[Optional[str], Optional[str]]  # on or after, before
+
+
+class CardFilter(NamedTuple):
+    """ Parsed filter terms; empty fields do not filter """
+
+    lists: Tuple[str, ...] = ()
+    labels: Tuple[str, ...] = ()
+    members: Tuple[str, ...] = ()
+    due: Window = (None, None)
+    activity: Window = (None, None)
+    state: str = "open"
+
+    def needs(self) -> Tuple[str, ...]:
+        """ Export columns holding the card data the filter reads """
+        used = (
+            ("labels", self.labels),
+            ("members", self.members),
+            ("due", self.due != (None, None)),
+            ("last_activity", self.activity != (None, None)),
+        )
+        return tuple(column for column, value in used if value)
+
+    def for_board(self, board: Board) -> "CardFilter":
+        """ The filter with member ids given as the names board shows for them """
+        names = {id_: name.casefold() for id_, name in board.members.items()}
+        return self._replace(
+            members=tuple(names.get(member, member) for member in self.members)
+        )
+
+    def list_matches(self, list_: TrelloList) -> bool:
+        """ Whether cards of list_ are wanted """
+        return not self.lists or bool(
+            {list_.id, list_.name.strip().casefold()} & set(self.lists)
+        )
+
+    def card_matches(self, card: Card) -> bool:
+        """ Whether card passes the label, member, due and activity terms """
+        return (
+            (not self.labels or matches_any(card.labels, self.labels))
+            and (not self.members or matches_any(card.members, self.members))
+            and in_window(card.due, self.due)
+            and in_window(card.last_activity, self.activity)
+        )
+
+
+def matches_any(values: Iterable[str], wanted: Tuple[str, ...]) -> bool:
+    """ Whether any of values is in wanted, ignoring case """
+    return any(value.casefold() in wanted for value in values)
+
+
+def in_window(value: Optional[str], window: Window) -> bool:
+    """ Whether an ISO date value is inside window, unbounded sides pass """
+    since, before = window
+    if since is None and before is None:
+        return True
+    return (
+        value is not None
+        and (since is None or value >= since)
+        and (before is None or value < before)
+    )
+
+
+def parse_filter(terms: Iterable[str]) -> Optional[CardFilter]:
+    """ CardFilter of terms, None without terms, ValueError for a bad term """
+
+    values = dict(
+        lists=[],
+        labels=[],
+        members=[],
+        due=[None, None],
+        activity=[None, None],
+        state="open",
+    )
+    terms = list(terms)
+    for term in terms:
+        match = TERM.match(term)
+        if match is None:
+            raise ValueError(f"{term!r} is not key=value, key>=date or key<date")
+        key, operator, value = match.groups()
+        if key in ("due", "activity") and operator != "=":
+            values[key][operator == "<"] = value
+        elif key in ("list", "label", "member") and operator == "=":
+            values[f"{key}s"].append(value.casefold())
+        elif key == "state" and operator == "=" and value in STATES:
+            values["state"] = value
+        else:
+            raise ValueError(
+                f"cannot filter on {term!r}: use list=, label=, member=, "
+                f"due>=, due<, activity>=, activity< or state={'|'.join(STATES)}"
+            )
+    if not terms:
+        return None
+    return CardFilter(
+        **{
+            key: tuple(value) if isinstance(value, list) else value
+            for key, value in values.items()
+        }
+    )
+
+
+def filter_board(board: Board, card_filter: CardFilter) -> Board:
+    """ Keep the lists and cards of a whole board model that pass card_filter """
+    if card_filter.state != "open":
+        raise ValueError("only open cards are held locally, fetch to filter on state")
+    card_filter = card_filter.for_board(board)
+    board.select(card_filter.list_matches, card_filter.card_matches)
+    return board
+
+
+def fetch_filtered(
+    api: TrelloApi,
+    board_id: str,
+    engine: FetchEngine,
+    card_filter: CardFilter,
+    columns: Iterable[str] = (),
+) -> Board:
+    """ Fetch the lists and cards of board board_id passing card_filter """
+
+    needed = tuple(columns) + card_filter.needs()
+    light = [name for name in needed if name not in DETAIL_COLUMNS]
+    if not card_filter.needs():  # Trello selects every card, fetch them whole
+        light = list(needed)
+    board_params, card_params = fetch_params(light)
+    if card_filter.state != "open":  # archived cards may be on archived lists
+        board_params = dict(board_params, lists="all")
+    board = Board(api.get(f"/boards/{board_id}", **board_params))
+    card_filter = card_filter.for_board(board)
+    board.select(card_filter.list_matches, lambda card: True)
+
+    state = STATES[card_filter.state]
+    if card_filter.lists:
+        paths = [f"/lists/{list_.id}/cards/{state}" for list_ in board.lists]
+    else:
+        paths = [f"/boards/{board_id}/cards/{state}"]
+
+    def cards(params: dict, keep: Callable[[dict], bool]) -> List[Card]:
+        pages = engine.map(
+            lambda path: [
+                Card(card) for card in api.paginate(path, **params) if keep(card)
+            ],
+            paths,
+        )
+        return list(chain.from_iterable(pages))
+
+    board.add_cards(cards(card_params, lambda card: True))
+    board.select(lambda list_: True, card_filter.card_matches)
+
+    if len(light) < len(needed):
+        _, detail_params = fetch_params(needed)
+        matched = list(board.cards)
+        if len(matched) <= DETAIL_LIMIT:
+            board.replace_cards(
+                engine.map(
+                    lambda card: Card(api.get(f"/cards/{card.id}", **detail_params)),
+                    matched,
+                )
+            )
+        else:
+            ids = {card.id for card in matched}
+            board.replace_cards(cards(detail_params, lambda card: card["id"] in ids))
+    return board
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+
+"""
+Card history export
+
+The card actions of a board (comments, moves, edits and who made them) are
+read from /boards/{id}/actions, split into date windows that are paged
+concurrently on the FetchEngine.  Pages pass through a bounded queue to one
+consumer that spills them to a temporary sqlite file indexed by card, so
+memory holds a few pages however many actions the board has.  The history
+is then read back card by card and written as a History sheet per list
+(xlsx), or with a list column (csv, jsonl), or a table per list (parquet).
+"""
+
+import csv
+import json
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from trellod.api import PAGE_LIMIT, TrelloApi
+from trellod.engine import FetchEngine
+from trellod.model import Board, TrelloList
+from trellod.snapshot import CARD_ACTIONS
+from trellod.xlsx import StreamingWorkbook
+
+HISTORY_ACTIONS = CARD_ACTIONS + (
+    "commentCard",
+    "addMemberToCard",
+    "removeMemberFromCard",
+)
+
+HISTORY_PARAMS = dict(
+    filter=",".join(HISTORY_ACTIONS),
+    fields="type,date,data,idMemberCreator",
+    memberCreator="true",
+    memberCreator_fields="fullName,username",
+)
+
+HISTORY_HEADER = ("Card", "Date", "Member", "Action", "Detail")
+HISTORY_FIELDS = ("list", "card", "card_id", "date", "member", "action", "detail")
+
+TRELLO_EPOCH = 1293840000  # 2011-01-01, before the first Trello board
+WINDOWS_PER_WORKER = 4
+
+
+def object_id(timestamp: float) -> str:
+    """ Smallest Trello id created at timestamp, usable as a since/before cursor """
+    return f"{int(timestamp):08x}" + "0" * 16
+
+
+def created(trello_id: str) -> Optional[int]:
+    """ Creation time of a Trello object from its id, None if it is not one """
+    try:
+        return int(trello_id[:8], 16) if len(trello_id) == 24 else None
+    except ValueError:
+        return None
+
+
+def windows(board_id: str, count: int, now: Optional[float] = None) -> List[tuple]:
+    """ (since, before) id cursors splitting the board's lifetime into count windows """
+    start = created(board_id) or TRELLO_EPOCH
+    end = (time.time() if now is None else now) + 60
+    step = (end - start) / max(1, count)
+    bounds = [start + step * index for index in range(count)] + [end]
+    cursors = [object_id(bound) for bound in bounds]
+    cursors[0] = object_id(start - 1)
+    return list(zip(cursors[:-1], cursors[1:]))
+
+
+def describe(action: dict) -> str:
+    """ One line account of what a card action did """
+
+    data = action.get("data", {})
+    kind = action.get("type", "")
+    old = data.get("old", {})
+    if kind == "commentCard":
+        return data.get("text", "")
+    if kind == "updateCard":
+        if "listAfter" in data:
+            before = data.get("listBefore", {}).get("name", "")
+            return f"moved from {before} to {data['listAfter'].get('name', '')}"
+        card = data.get("card", {})
+        if "closed" in old:
+            return "archived" if card.get("closed") else "restored"
+        if list(old) == ["name"]:
+            return f"renamed from {old['name']} to {card.get('name', '')}"
+        return f"changed {', '.join(sorted(old))}"
+    if kind in ("createCard", "copyCard"):
+        return f"created in {data.get('list', {}).get('name', '')}"
+    if kind in ("addAttachmentToCard", "deleteAttachmentFromCard"):
+        return data.get("attachment", {}).get("name", "")
+    if kind in ("addChecklistToCard", "removeChecklistFromCard", "updateChecklist"):
+        return data.get("checklist", {}).get("name", "")
+    if kind in ("createCheckItem", "updateCheckItem", "deleteCheckItem"):
+        return data.get("checkItem", {}).get("name", "")
+    if kind == "updateCheckItemStateOnCard":
+        item = data.get("checkItem", {})
+        return f"{item.get('state', '')} {item.get('name', '')}".strip()
+    if kind in ("addMemberToCard", "removeMemberFromCard"):
+        return data.get("member", {}).get("name", "")
+    return ""
+
+
+class History:
+    """ Card actions of a board, spilled to a temporary sqlite file """
+
+    def __init__(self, board: Board):
+        self.card_ids = {card.id for card in board.cards}
+        self.count = 0
+        self._folder = tempfile.TemporaryDirectory(prefix="trellod-history-")
+        self.db = sqlite3.connect(str(Path(self._folder.name) / "history.sqlite"))
+        self.db.execute("PRAGMA journal_mode = OFF")
+        self.db.execute("PRAGMA synchronous = OFF")
+        self.db.execute(
+            "CREATE TABLE actions (id TEXT PRIMARY KEY, card_id TEXT, date TEXT, "
+            "member TEXT, type TEXT, detail TEXT)"
+        )
+
+    def add(self, actions: Iterable[dict]) -> None:
+        """ Store the actions on cards of the board """
+        rows = []
+        for action in actions:
+            card_id = action.get("data", {}).get("card", {}).get("id")
+            if card_id not in self.card_ids:
+                continue
+            member = action.get("memberCreator") or {}
+            rows.append(
+                (
+                    action["id"],
+                    card_id,
+                    action.get("date", ""),
+                    member.get("fullName") or member.get("username") or "",
+                    action.get("type", ""),
+                    describe(action),
+                )
+            )
+        with self.db:
+            # windows share their boundaries, so an action may come twice
+            self.db.executemany(
+                "INSERT OR IGNORE INTO actions VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+        self.count = self.db.total_changes
+
+    def index(self) -> None:
+        """ Index the actions by card, once they are all stored """
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS actions_card ON actions (card_id, date)"
+        )
+
+    def _card_rows(self, list_: TrelloList) -> Iterator[tuple]:
+        """ (card, date, member, type, detail) of the cards of list_ """
+        for card in list_.cards:
+            for row in self.db.execute(
+                "SELECT date, member, type, detail FROM actions "
+                "WHERE card_id = ? ORDER BY date, id",
+                (card.id,),
+            ):
+                yield (card,) + row
+
+    def rows(self, list_: TrelloList) -> Iterator[tuple]:
+        """ HISTORY_HEADER rows of the cards of list_, oldest action first """
+        for card, *row in self._card_rows(list_):
+            yield (card.name.strip(), *row)
+
+    def records(self, lists: List[TrelloList]) -> Iterator[dict]:
+        """ HISTORY_FIELDS dicts of the cards of lists """
+        for list_ in lists:
+            list_name = list_.name.strip()
+            for card, date, member, kind, detail in self._card_rows(list_):
+                yield dict(
+                    list=list_name,
+                    card=card.name.strip(),
+                    card_id=card.id,
+                    date=date,
+                    member=member,
+                    action=kind,
+                    detail=detail,
+                )
+
+    def close(self) -> None:
+        """ Delete the temporary file """
+        self.db.close()
+        self._folder.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def fetch_history(
+    api: TrelloApi, board: Board, engine: FetchEngine, num_windows: int = 0
+) -> History:
+    """ Page the board's card actions concurrently by date window into a History """
+
+    history = History(board)
+    bounds = windows(board.id, num_windows or engine.workers * WINDOWS_PER_WORKER)
+    pages: queue.Queue = queue.Queue(maxsize=2 * engine.workers)
+    cancelled = threading.Event()  # set when the pages will not be read
+
+    def put(page: Optional[list]) -> None:
+        while not cancelled.is_set():
+            try:
+                pages.put(page, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def fetch_window(since: str, before: str) -> None:
+        try:
+            page = []
+            actions = api.paginate(
+                f"/boards/{board.id}/actions",
+                since=since,
+                before=before,
+                **HISTORY_PARAMS,
+            )
+            for action in actions:
+                page.append(action)
+                if len(page) == PAGE_LIMIT:
+                    put(page)
+                    page = []
+                    if cancelled.is_set():
+                        return
+            if page:
+                put(page)
+        finally:
+            put(None)
+
+    futures = [engine.submit(fetch_window, since, before) for since, before in bounds]
+    finished = 0
+    try:
+        while finished < len(futures):
+            page = pages.get()
+            if page is None:
+                finished += 1
+            else:
+                history.add(page)
+        for future in futures:
+            future.result()
+    except BaseException:
+        cancelled.set()  # so windows blocked on a full queue finish
+        history.close()
+        raise
+    history.index()
+    return history
+
+
+def write_history_xlsx(filename: str, lists: list, history: History) -> None:
+    """ Write a History sheet per list """
+    workbook = StreamingWorkbook(filename)
+    for list_ in lists:
+        sheet_name = f"History {list_.name}"[:31]
+        workbook.write_sheet(sheet_name, HISTORY_HEADER, history.rows(list_))
+    workbook.close()
+
+
+def write_history_csv(filename: str, lists: list, history: History) -> None:
+    """ Stream the history of lists to a CSV file """
+    with open(filename, "w", newline="", encoding="utf-8") as output:
+        writer = csv.DictWriter(output, fieldnames=HISTORY_FIELDS)
+        writer.writeheader()
+        writer.writerows(history.records(lists))
+
+
+def write_history_jsonl(filename: str, lists: list, history: History) -> None:
+    """ Stream the history of lists to a JSON lines file """
+    with open(filename, "w", encoding="utf-8") as output:
+        for record in history.records(lists):
+            output.write(json.dumps(record, ensure_ascii=False))
+            output.write("\n")
+
+
+def write_history_parquet(filename: str, lists: list, history: History) -> None:
+    """ Write folder filename with a history table per list """
+
+    try:
+        import pyarrow as pa  # pylint: disable=import-outside-toplevel
+        import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+    except ImportError as error:
+        raise ImportError(
+            "parquet output needs pyarrow: pip install pyarrow"
+        ) from error
+
+    folder = Path(filename)
+    folder.mkdir(parents=True, exist_ok=True)
+    schema = pa.schema([(field, pa.string()) for field in HISTORY_FIELDS])
+    for index, list_ in enumerate(lists):
+        columns: Dict[str, list] = {field: [] for field in HISTORY_FIELDS}
+        for record in history.records([list_]):
+            for field, value in record.items():
+                columns[field].append(value)
+        table = pa.Table.from_pydict(columns, schema=schema)
+        pq.write_table(table, folder / f"history_{index:03d}.parquet")
+
+
+HISTORY_WRITERS: Dict[str, Callable[[str, list, History], None]] = dict(
+    xlsx=write_history_xlsx,
+    csv=write_history_csv,
+    jsonl=write_history_jsonl,
+    parquet=write_history_parquet,
+)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+"""
+Incremental reader for large JSON objects
+
+Trello's "Export as JSON" file is one object whose arrays (actions, cards,
+checklists, ...) can run to hundreds of MB.  iter_members reads such a file
+a chunk at a time and yields the members of the top-level object, and the
+elements of its arrays one at a time, so only one element is held in memory.
+Elements are parsed with the standard library json decoder.
+"""
+
+import json
+import re
+from typing import IO, Any, Container, Iterator, Tuple
+
+CHUNK_SIZE = 1 << 20
+WHITESPACE = " \t\n\r"
+NEXT_CHAR = re.compile(r"[ \t\n\r]*(.?)", re.DOTALL)
+
+
+class JsonStream:
+    """ Buffered reader of JSON values from a text file """
+
+    def __init__(self, file: IO[str], chunk_size: int = CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _read(self) -> bool:
+        """ Append a chunk to the buffer, dropping what was consumed """
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """ Next non-whitespace character, "" at the end of the file """
+        while True:
+            buffer = self.buffer
+            while self.pos < len(buffer) and buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(buffer):
+                return buffer[self.pos]
+            if not self._read():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """ Consume the next non-whitespace character, one of chars """
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(
+                f"Expecting one of {chars!r}", self.buffer, self.pos
+            )
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        """ Decode the next value, reading more of the file until it is complete """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._read():
+                    raise
+                continue
+            # a value is complete once the delimiter after it is read: a number
+            # cut at the end of a chunk decodes as a shorter number
+            char = NEXT_CHAR.match(self.buffer, end).group(1)
+            if (not char or char not in ",]}:") and self._read():
+                continue
+            self.pos = end
+            return value
+
+    def items(self) -> Iterator[Any]:
+        """ Decode the elements of the array starting at the next character """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+
+def iter_members(
+    file: IO[str], arrays: Container[str] = (), chunk_size: int = CHUNK_SIZE
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Yield (key, value) for each member of the top-level object in file
+
+    The elements of array members named in arrays are yielded one at a time
+    as (key, element); other arrays are skipped element by element, so no
+    array is ever held whole.
+    """
+
+    stream = JsonStream(file, chunk_size)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if stream.peek() == "[":
+            for item in stream.items():
+                if key in arrays:
+                    yield key, item
+        else:
+            yield key, stream.value()
+        if stream.expect(",}") == "}":
+            return
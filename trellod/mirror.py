@@ -0,0 +1,487 @@
+#!/usr/bin/env python
+
+"""
+Local SQLite mirror of Trello boards
+
+trellod sync copies boards, lists, cards, checklists, check items, labels,
+members and attachments into an sqlite database next to the config file.
+Boards whose dateLastActivity matches the mirror are skipped, and rows are
+upserted, so repeated syncs are cheap.  Exports can then be built from the
+mirror with no network at all.
+"""
+
+import sqlite3
+import time
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from trellod.api import TrelloApi
+from trellod.engine import FetchEngine
+from trellod.model import Board
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS boards (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    closed INTEGER NOT NULL DEFAULT 0,
+    id_organization TEXT,
+    date_last_activity TEXT,
+    synced REAL
+);
+CREATE TABLE IF NOT EXISTS lists (
+    id TEXT PRIMARY KEY,
+    board_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    pos REAL,
+    closed INTEGER NOT NULL DEFAULT 0,
+    synced REAL
+);
+CREATE TABLE IF NOT EXISTS cards (
+    id TEXT PRIMARY KEY,
+    board_id TEXT NOT NULL,
+    list_id TEXT,
+    name TEXT NOT NULL,
+    description TEXT,
+    pos REAL,
+    due TEXT,
+    closed INTEGER NOT NULL DEFAULT 0,
+    date_last_activity TEXT,
+    synced REAL,
+    url TEXT,
+    short_url TEXT
+);
+CREATE TABLE IF NOT EXISTS checklists (
+    id TEXT PRIMARY KEY,
+    board_id TEXT NOT NULL,
+    card_id TEXT NOT NULL,
+    name TEXT,
+    pos REAL,
+    synced REAL
+);
+CREATE TABLE IF NOT EXISTS check_items (
+    id TEXT PRIMARY KEY,
+    board_id TEXT NOT NULL,
+    checklist_id TEXT NOT NULL,
+    card_id TEXT NOT NULL,
+    name TEXT,
+    pos REAL,
+    state TEXT,
+    synced REAL
+);
+CREATE TABLE IF NOT EXISTS attachments (
+    id TEXT PRIMARY KEY,
+    board_id TEXT NOT NULL,
+    card_id TEXT NOT NULL,
+    name TEXT,
+    url TEXT,
+    mime_type TEXT,
+    bytes INTEGER,
+    synced REAL
+);
+CREATE TABLE IF NOT EXISTS labels (
+    id TEXT PRIMARY KEY,
+    board_id TEXT NOT NULL,
+    name TEXT,
+    color TEXT,
+    synced REAL
+);
+CREATE TABLE IF NOT EXISTS members (
+    id TEXT PRIMARY KEY,
+    username TEXT,
+    full_name TEXT
+);
+CREATE TABLE IF NOT EXISTS card_labels (
+    card_id TEXT NOT NULL,
+    label_id TEXT NOT NULL,
+    board_id TEXT NOT NULL,
+    synced REAL,
+    PRIMARY KEY (card_id, label_id)
+);
+CREATE TABLE IF NOT EXISTS card_members (
+    card_id TEXT NOT NULL,
+    member_id TEXT NOT NULL,
+    board_id TEXT NOT NULL,
+    synced REAL,
+    PRIMARY KEY (card_id, member_id)
+);
+CREATE INDEX IF NOT EXISTS boards_activity ON boards (date_last_activity);
+CREATE INDEX IF NOT EXISTS lists_board ON lists (board_id);
+CREATE INDEX IF NOT EXISTS cards_board ON cards (board_id);
+CREATE INDEX IF NOT EXISTS cards_list ON cards (list_id);
+CREATE INDEX IF NOT EXISTS cards_activity ON cards (date_last_activity);
+CREATE INDEX IF NOT EXISTS checklists_board ON checklists (board_id);
+CREATE INDEX IF NOT EXISTS checklists_card ON checklists (card_id);
+CREATE INDEX IF NOT EXISTS check_items_board ON check_items (board_id);
+CREATE INDEX IF NOT EXISTS check_items_card ON check_items (card_id);
+CREATE INDEX IF NOT EXISTS attachments_board ON attachments (board_id);
+CREATE INDEX IF NOT EXISTS attachments_card ON attachments (card_id);
+CREATE INDEX IF NOT EXISTS labels_board ON labels (board_id);
+CREATE INDEX IF NOT EXISTS card_labels_board ON card_labels (board_id);
+CREATE INDEX IF NOT EXISTS card_members_board ON card_members (board_id);
+"""
+
+# Columns added to tables of older mirrors: (table, column, type)
+ADDED_COLUMNS = (
+    ("cards", "url", "TEXT"),
+    ("cards", "short_url", "TEXT"),
+)
+
+# Tables holding rows of a single board, cleaned of stale rows after each sync
+BOARD_TABLES = (
+    "lists",
+    "cards",
+    "checklists",
+    "check_items",
+    "attachments",
+    "labels",
+    "card_labels",
+    "card_members",
+)
+
+SYNC_BOARD_PARAMS = dict(
+    fields="name,closed,idOrganization,dateLastActivity",
+    lists="all",
+    list_fields="name,pos,closed",
+    labels="all",
+    label_fields="name,color",
+    members="all",
+    member_fields="username,fullName",
+)
+
+SYNC_CARD_PARAMS = dict(
+    fields="name,desc,idList,pos,due,closed,dateLastActivity,idLabels,idMembers,"
+    "url,shortUrl",
+    attachments="true",
+    attachment_fields="name,url,mimeType,bytes",
+    checklists="all",
+    checklist_fields="name,idCard,pos",
+)
+
+
+def fetch_sync_json(api: TrelloApi, board_id: str) -> dict:
+    """ Fetch everything the mirror keeps for a board, archived cards included """
+    board = api.get(f"/boards/{board_id}", **SYNC_BOARD_PARAMS)
+    board["cards"] = list(
+        api.paginate(f"/boards/{board_id}/cards/all", **SYNC_CARD_PARAMS)
+    )
+    return board
+
+
+# Columns of each table, in insert order, and its conflict key
+COLUMNS = dict(
+    boards=("id name closed id_organization date_last_activity synced", "id"),
+    lists=("id board_id name pos closed synced", "id"),
+    cards=(
+        "id board_id list_id name description pos due closed date_last_activity synced "
+        "url short_url",
+        "id",
+    ),
+    checklists=("id board_id card_id name pos synced", "id"),
+    check_items=("id board_id checklist_id card_id name pos state synced", "id"),
+    attachments=("id board_id card_id name url mime_type bytes synced", "id"),
+    labels=("id board_id name color synced", "id"),
+    members=("id username full_name", "id"),
+    card_labels=("card_id label_id board_id synced", "card_id label_id"),
+    card_members=("card_id member_id board_id synced", "card_id member_id"),
+)
+
+
+def upsert(table: str) -> str:
+    """ INSERT ... ON CONFLICT DO UPDATE statement for table """
+    columns, key = (names.split() for names in COLUMNS[table])
+    updates = ", ".join(
+        f"{column} = excluded.{column}" for column in columns if column not in key
+    )
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates}"
+    )
+
+
+def board_rows(board: dict, synced: float) -> Dict[str, list]:
+    """ Rows of each table, in COLUMNS order, for the json of a board """
+
+    board_id = board["id"]
+    rows: Dict[str, list] = {table: [] for table in COLUMNS}
+    rows["boards"].append(
+        (
+            board_id,
+            board.get("name") or "",
+            board.get("closed", False),
+            board.get("idOrganization"),
+            board.get("dateLastActivity"),
+            synced,
+        )
+    )
+    for list_ in board.get("lists", []):
+        rows["lists"].append(
+            (
+                list_["id"],
+                board_id,
+                list_.get("name") or "",
+                list_.get("pos"),
+                list_.get("closed", False),
+                synced,
+            )
+        )
+    for label in board.get("labels", []):
+        rows["labels"].append(
+            (label["id"], board_id, label.get("name"), label.get("color"), synced)
+        )
+    for member in board.get("members", []):
+        rows["members"].append(
+            (member["id"], member.get("username"), member.get("fullName"))
+        )
+
+    for card in board.get("cards", []):
+        card_id = card["id"]
+        rows["cards"].append(
+            (
+                card_id,
+                board_id,
+                card.get("idList"),
+                card.get("name") or "",
+                card.get("desc") or "",
+                card.get("pos"),
+                card.get("due"),
+                card.get("closed", False),
+                card.get("dateLastActivity"),
+                synced,
+                card.get("url"),
+                card.get("shortUrl"),
+            )
+        )
+        for checklist in card.get("checklists", []):
+            rows["checklists"].append(
+                (
+                    checklist["id"],
+                    board_id,
+                    card_id,
+                    checklist.get("name"),
+                    checklist.get("pos"),
+                    synced,
+                )
+            )
+            for item in checklist.get("checkItems", []):
+                rows["check_items"].append(
+                    (
+                        item["id"],
+                        board_id,
+                        checklist["id"],
+                        card_id,
+                        item.get("name"),
+                        item.get("pos"),
+                        item.get("state"),
+                        synced,
+                    )
+                )
+        for attachment in card.get("attachments", []):
+            rows["attachments"].append(
+                (
+                    attachment["id"],
+                    board_id,
+                    card_id,
+                    attachment.get("name"),
+                    attachment.get("url"),
+                    attachment.get("mimeType"),
+                    attachment.get("bytes"),
+                    synced,
+                )
+            )
+        for label_id in card.get("idLabels", []):
+            rows["card_labels"].append((card_id, label_id, board_id, synced))
+        for member_id in card.get("idMembers", []):
+            rows["card_members"].append((card_id, member_id, board_id, synced))
+    return rows
+
+
+class Mirror:
+    """ sqlite mirror of Trello boards """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """ Add the ADDED_COLUMNS an older mirror lacks, for the next sync to fill """
+        with self.db:
+            added = False
+            for table, column, kind in ADDED_COLUMNS:
+                names = {
+                    row[1] for row in self.db.execute(f"PRAGMA table_info({table})")
+                }
+                if column not in names:
+                    self.db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+                    added = True
+            if added:  # have every board synced again
+                self.db.execute("UPDATE boards SET date_last_activity = NULL")
+
+    def close(self) -> None:
+        """ Close the database """
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def activity(self) -> Dict[str, str]:
+        """ dateLastActivity of every mirrored board """
+        return dict(self.db.execute("SELECT id, date_last_activity FROM boards"))
+
+    def boards(self, include_closed: bool = False) -> List[Tuple[str, str]]:
+        """ (id, name) of mirrored boards, by name """
+        where = "" if include_closed else "WHERE closed = 0"
+        return self.db.execute(
+            f"SELECT id, name FROM boards {where} ORDER BY name"
+        ).fetchall()
+
+    def store_board(self, board: dict) -> None:
+        """ Upsert the json of a board and remove its rows that have gone """
+
+        synced = time.time()
+        with self.db:
+            for table, rows in board_rows(board, synced).items():
+                self.db.executemany(upsert(table), rows)
+            for table in BOARD_TABLES:
+                self.db.execute(
+                    f"DELETE FROM {table} WHERE board_id = ? AND synced < ?",
+                    (board["id"], synced),
+                )
+
+    def sync(
+        self, api: TrelloApi, boards: List[dict], engine: FetchEngine
+    ) -> Tuple[int, int]:
+        """
+        Mirror boards whose dateLastActivity changed, return (synced, skipped)
+
+        Boards are fetched concurrently and stored as they arrive.
+        """
+
+        known = self.activity()
+        changed = [
+            board
+            for board in boards
+            if known.get(board["id"]) != board.get("dateLastActivity")
+            or board.get("dateLastActivity") is None
+        ]
+        futures = [
+            engine.submit(fetch_sync_json, api, board["id"]) for board in changed
+        ]
+        for future in as_completed(futures):
+            self.store_board(future.result())
+        return len(changed), len(boards) - len(changed)
+
+    def load_board(self, board_id: str) -> Board:
+        """ Board model of the open lists and cards of a mirrored board """
+
+        db = self.db
+        row = db.execute(
+            "SELECT id, name, date_last_activity FROM boards WHERE id = ?", (board_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"board {board_id} is not in the mirror")
+        lists = [
+            dict(id=id_, name=name, pos=pos)
+            for id_, name, pos in db.execute(
+                "SELECT id, name, pos FROM lists "
+                "WHERE board_id = ? AND closed = 0 ORDER BY pos",
+                (board_id,),
+            )
+        ]
+        members = [
+            dict(id=id_, username=username, fullName=full_name)
+            for id_, username, full_name in db.execute(
+                "SELECT DISTINCT id, username, full_name FROM members "
+                "JOIN card_members ON member_id = id WHERE board_id = ?",
+                (board_id,),
+            )
+        ]
+        header = dict(
+            id=row[0],
+            name=row[1],
+            dateLastActivity=row[2],
+            lists=lists,
+            members=members,
+        )
+        return Board(header, cards=self._card_json(board_id))
+
+    def _card_json(self, board_id: str) -> Iterator[dict]:
+        """ Card json, as the fetch layer returns it, of the open cards of a board """
+
+        db = self.db
+        checklists: Dict[str, List[dict]] = {}
+        by_id: Dict[str, dict] = {}
+        for id_, card_id, name, pos in db.execute(
+            "SELECT id, card_id, name, pos FROM checklists WHERE board_id = ?",
+            (board_id,),
+        ):
+            by_id[id_] = dict(id=id_, name=name, pos=pos, checkItems=[])
+            checklists.setdefault(card_id, []).append(by_id[id_])
+        for checklist_id, name, pos, state in db.execute(
+            "SELECT checklist_id, name, pos, state FROM check_items WHERE board_id = ?",
+            (board_id,),
+        ):
+            if checklist_id in by_id:
+                by_id[checklist_id]["checkItems"].append(
+                    dict(name=name, pos=pos, state=state)
+                )
+
+        attachments: Dict[str, List[dict]] = {}
+        for id_, card_id, name, url, mime_type, size in db.execute(
+            "SELECT id, card_id, name, url, mime_type, bytes FROM attachments "
+            "WHERE board_id = ?",
+            (board_id,),
+        ):
+            attachments.setdefault(card_id, []).append(
+                dict(id=id_, name=name, url=url, mimeType=mime_type, bytes=size)
+            )
+
+        labels: Dict[str, List[dict]] = {}
+        for card_id, name, color in db.execute(
+            "SELECT card_id, name, color FROM card_labels "
+            "JOIN labels ON label_id = labels.id WHERE card_labels.board_id = ?",
+            (board_id,),
+        ):
+            labels.setdefault(card_id, []).append(dict(name=name, color=color))
+        members: Dict[str, List[str]] = {}
+        for card_id, member_id in db.execute(
+            "SELECT card_id, member_id FROM card_members WHERE board_id = ?",
+            (board_id,),
+        ):
+            members.setdefault(card_id, []).append(member_id)
+
+        for id_, list_id, name, desc, pos, due, activity, url, short_url in db.execute(
+            "SELECT id, list_id, name, description, pos, due, date_last_activity, "
+            "url, short_url FROM cards WHERE board_id = ? AND closed = 0",
+            (board_id,),
+        ):
+            yield dict(
+                id=id_,
+                idList=list_id,
+                name=name,
+                desc=desc,
+                pos=pos,
+                due=due,
+                dateLastActivity=activity,
+                url=url,
+                shortUrl=short_url,
+                checklists=checklists.get(id_, []),
+                attachments=attachments.get(id_, []),
+                labels=labels.get(id_, []),
+                idMembers=members.get(id_, []),
+            )
+
+    def find_board(self, name_or_id: str) -> Optional[str]:
+        """ Id of the mirrored board with id or name name_or_id """
+        row = self.db.execute(
+            "SELECT id FROM boards WHERE id = ? OR name = ? ORDER BY closed LIMIT 1",
+            (name_or_id, name_or_id),
+        ).fetchone()
+        return row[0] if row else None
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+"""
+In-memory Trello board model
+
+Built from the JSON returned by a few nested-resource board requests,
+so that the summary sheet and the per-list sheets need no further API calls.
+Cards can be added a page at a time, so raw JSON for only one page is held;
+the model itself holds every card of the board.
+
+The classes use __slots__ and keep only the fields the writers use, card
+checklists and attachments are tuples, and strings repeated across cards
+(list ids and names, checklist names, mime types) are interned, so a large
+board costs a fraction of the memory of the equivalent py-trello objects.
+"""
+
+from sys import intern
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+def by_pos(items: list) -> list:
+    """ Return Trello json items sorted by their position """
+    return sorted(items, key=lambda item: item.get("pos", 0))
+
+
+class Attachment:
+    """ Card attachment """
+
+    __slots__ = ("id", "name", "url", "mime_type", "size")
+
+    def __init__(self, json: dict):
+        self.id = json["id"]
+        self.name = json.get("name") or ""
+        self.url = json.get("url") or ""
+        self.mime_type = intern(json.get("mimeType") or "")
+        self.size = json.get("bytes") or 0
+
+
+class Checklist:
+    """ Card checklist, items hold the check item names """
+
+    __slots__ = ("id", "name", "items")
+
+    def __init__(self, json: dict):
+        self.id = json["id"]
+        self.name = intern(json.get("name") or "")
+        self.items = tuple(item["name"] for item in by_pos(json.get("checkItems", [])))
+
+
+class Card:
+    """
+    Trello card with its checklists and attachments
+
+    labels holds label names, members the member ids, which the Board
+    replaces by names when its json lists the board's members.
+    """
+
+    __slots__ = (
+        "id",
+        "name",
+        "description",
+        "list_id",
+        "pos",
+        "due",
+        "last_activity",
+        "checklists",
+        "attachments",
+        "labels",
+        "members",
+        "url",
+        "short_url",
+    )
+
+    def __init__(self, json: dict):
+        self.id = json["id"]
+        self.name = json.get("name") or ""
+        self.description = json.get("desc") or ""
+        list_id = json.get("idList")
+        self.list_id = intern(list_id) if list_id else None
+        self.pos = json.get("pos", 0)
+        self.due = json.get("due")
+        self.last_activity = json.get("dateLastActivity")
+        self.checklists = tuple(
+            Checklist(checklist) for checklist in by_pos(json.get("checklists", []))
+        )
+        self.attachments = tuple(
+            Attachment(attachment) for attachment in json.get("attachments", [])
+        )
+        self.labels = tuple(
+            intern(label.get("name") or label.get("color") or "")
+            for label in json.get("labels", [])
+        )
+        self.members = tuple(intern(member) for member in json.get("idMembers", []))
+        self.url = json.get("url") or ""
+        self.short_url = json.get("shortUrl") or ""
+
+
+class TrelloList:
+    """ Trello list and its open cards """
+
+    __slots__ = ("id", "name", "cards")
+
+    def __init__(self, json: dict):
+        self.id = intern(json["id"])
+        self.name = intern(json.get("name") or "")
+        self.cards: List[Card] = []
+
+
+class Board:
+    """
+    Trello board holding its open lists
+
+    cards, if given, is an iterable of card json used instead of json["cards"],
+    so pages of cards can be turned into Cards as they arrive.
+    """
+
+    __slots__ = ("id", "name", "last_activity", "lists", "members", "_by_id")
+
+    def __init__(self, json: dict, cards: Optional[Iterable[dict]] = None):
+        self.id = json["id"]
+        self.name = json.get("name") or ""
+        self.last_activity = json.get("dateLastActivity")
+        self.lists = [TrelloList(list_) for list_ in by_pos(json.get("lists", []))]
+        self.members: Dict[str, str] = {
+            member["id"]: intern(member.get("fullName") or member.get("username") or "")
+            for member in json.get("members", [])
+        }
+
+        self._by_id: Dict[str, Card] = {}
+        card_json = json.get("cards", []) if cards is None else cards
+        self.add_cards(Card(card) for card in card_json)
+        self.add_checklists(json.get("checklists", []))
+
+    def add_cards(self, cards: Iterable[Card]) -> None:
+        """ Add cards to their lists, dropping those of closed lists """
+        lists: Dict[str, TrelloList] = {list_.id: list_ for list_ in self.lists}
+        for card in cards:
+            list_ = lists.get(card.list_id)
+            if list_ is None:  # card in a closed list
+                continue
+            list_.cards.append(self._name_members(card))
+            self._by_id[card.id] = card
+        for list_ in self.lists:
+            list_.cards.sort(key=lambda card: card.pos)
+
+    def _name_members(self, card: Card) -> Card:
+        if self.members:
+            card.members = tuple(
+                self.members.get(member, member) for member in card.members
+            )
+        return card
+
+    def select(
+        self,
+        keep_list: Callable[[TrelloList], bool],
+        keep_card: Callable[[Card], bool],
+    ) -> None:
+        """ Drop the lists and the cards the predicates reject """
+        self.lists = [list_ for list_ in self.lists if keep_list(list_)]
+        for list_ in self.lists:
+            list_.cards = [card for card in list_.cards if keep_card(card)]
+        self._by_id = {card.id: card for card in self.cards}
+
+    def replace_cards(self, cards: Iterable[Card]) -> None:
+        """ Put cards in place of the board's cards with the same ids """
+        fuller = {card.id: self._name_members(card) for card in cards}
+        for list_ in self.lists:
+            list_.cards = [fuller.get(card.id, card) for card in list_.cards]
+        self._by_id.update(
+            (card_id, card)
+            for card_id, card in fuller.items()
+            if card_id in self._by_id
+        )
+
+    def add_checklists(self, checklists: Iterable[dict]) -> None:
+        """ Add checklist json, given apart from its card, to the cards of the board """
+        for checklist in by_pos(checklists):
+            card = self._by_id.get(checklist.get("idCard"))
+            if card is not None:
+                card.checklists += (Checklist(checklist),)
+
+    @property
+    def cards(self):
+        """ Iterate over all cards on open lists """
+        for list_ in self.lists:
+            yield from list_.cards
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+"""
+Phase timing instrumentation
+
+Code marks its phases with
+
+  with profiler.phase("fetch board"):
+      ...
+
+When profiling is off, phase() returns a shared no-op context manager,
+so the hooks stay in place at almost no cost.
+When on, each phase records wall time, Trello requests and bytes received
+by the watched TrelloApi or TransportStats objects, and peak traced memory (tracemalloc).
+Phases nest; they are meant to be entered from the main thread.
+"""
+
+import contextlib
+import json
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List, Optional
+
+
+class NullPhase:
+    """ Phase recording nothing, for when profiling is off """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_PHASE = NullPhase()
+
+
+def reset_peak() -> None:
+    """ Start measuring a new memory peak; before Python 3.9 peaks only grow """
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+
+
+class Phase:
+    """ Measurement of one entry into a named phase """
+
+    def __init__(self, profiler: "Profiler", name: str, parent: Optional["Phase"]):
+        self.profiler = profiler
+        self.name = name
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent else 0
+        self.seconds = 0.0
+        self.requests = 0
+        self.bytes = 0
+        self.peak = 0
+        self._start = (0.0, 0, 0)
+
+    def __enter__(self):
+        profiler = self.profiler
+        if self.parent is not None:
+            self.parent.peak = max(self.parent.peak, tracemalloc.get_traced_memory()[1])
+        reset_peak()
+        profiler.stack.append(self)
+        self._start = (time.perf_counter(),) + profiler.counters()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        profiler = self.profiler
+        start, requests, bytes_ = self._start
+        now_requests, now_bytes = profiler.counters()
+        self.seconds = time.perf_counter() - start
+        self.requests = now_requests - requests
+        self.bytes = now_bytes - bytes_
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        profiler.stack.pop()
+        profiler.phases.append(self)
+        if self.parent is not None:
+            self.parent.peak = max(self.parent.peak, self.peak)
+        reset_peak()
+
+    def as_dict(self) -> dict:
+        """ Json-able measurements of the phase """
+        return dict(
+            name=self.name,
+            parent=self.parent.name if self.parent else None,
+            depth=self.depth,
+            seconds=round(self.seconds, 6),
+            requests=self.requests,
+            bytes=self.bytes,
+            peak_memory=self.peak,
+        )
+
+
+class Profiler:
+    """ Collects Phase measurements while enabled """
+
+    def __init__(self):
+        self.enabled = False
+        self.stack: List[Phase] = []
+        self.phases: List[Phase] = []
+        self.sources: list = []  # objects with request_count and bytes_received
+        self.tracing = False  # whether start started tracemalloc
+
+    def start(self) -> None:
+        """ Start recording phases, forgetting those and sources of an earlier run """
+        self.enabled = True
+        self.stack, self.phases, self.sources = [], [], []
+        self.tracing = not tracemalloc.is_tracing()
+        if self.tracing:
+            tracemalloc.start()
+
+    def stop(self) -> None:
+        """ Stop recording phases, and tracemalloc if start started it """
+        self.enabled = False
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+
+    def watch(self, source) -> None:
+        """ Count the requests and bytes of source, a TrelloApi or TransportStats, in each phase """
+        if self.enabled:
+            self.sources.append(source)
+
+    def counters(self):
+        """ Total requests and bytes of the watched sources """
+        return (
+            sum(source.request_count for source in self.sources),
+            sum(source.bytes_received for source in self.sources),
+        )
+
+    def phase(self, name: str):
+        """ Context manager measuring phase name, a no-op when disabled """
+        if not self.enabled:
+            return NULL_PHASE
+        return Phase(self, name, self.stack[-1] if self.stack else None)
+
+    def report(self) -> dict:
+        """ Json-able report of all recorded phases, in the order they started """
+        phases = sorted(self.phases, key=lambda phase: phase._start[0])
+        return dict(
+            phases=[phase.as_dict() for phase in phases],
+            requests=self.counters()[0],
+            bytes=self.counters()[1],
+        )
+
+    def write(self, path: Path) -> None:
+        """ Write the json report to path """
+        Path(path).write_text(json.dumps(self.report(), indent=2))
+
+
+profiler = Profiler()
+
+
+@contextlib.contextmanager
+def profiling(report: Optional[Path] = None, cprofile: Optional[Path] = None):
+    """ Profile the block, writing a json report and optionally a cProfile dump """
+
+    if report is None and cprofile is None:
+        yield
+        return
+
+    profiler.start()
+    stats = None
+    if cprofile is not None:
+        import cProfile  # pylint: disable=import-outside-toplevel
+
+        stats = cProfile.Profile()
+        stats.enable()
+    try:
+        with profiler.phase("total"):
+            yield
+    finally:
+        if stats is not None:
+            stats.disable()
+            stats.dump_stats(str(cprofile))
+        profiler.stop()
+        if report is not None:
+            profiler.write(report)
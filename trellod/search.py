@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+
+"""
+Full-text search over dumped boards
+
+Every dump updates an sqlite FTS5 index, next to the config file, of the
+card, description, checklist item and attachment url text the exports hold.
+Boards whose dateLastActivity is unchanged are skipped and only cards whose
+text changed are rewritten, so re-dumping is cheap.  trellod search queries
+the index without any Trello requests.
+"""
+
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from trellod.export import export_rows
+from trellod.model import Board
+
+INDEX_COLUMNS = (
+    "list",
+    "list_id",
+    "card",
+    "card_id",
+    "description",
+    "todo",
+    "attachments",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS boards (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    last_activity TEXT
+);
+CREATE TABLE IF NOT EXISTS cards (
+    rowid INTEGER PRIMARY KEY,
+    card_id TEXT NOT NULL UNIQUE,
+    board_id TEXT NOT NULL,
+    list_id TEXT,
+    board TEXT,
+    list TEXT,
+    card TEXT,
+    description TEXT,
+    todo TEXT,
+    attachments TEXT
+);
+CREATE INDEX IF NOT EXISTS cards_board ON cards (board_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5 (
+    board, list, card, description, todo, attachments,
+    content = 'cards', content_rowid = 'rowid'
+);
+CREATE TRIGGER IF NOT EXISTS cards_insert AFTER INSERT ON cards BEGIN
+    INSERT INTO cards_fts (rowid, board, list, card, description, todo, attachments)
+    VALUES (new.rowid, new.board, new.list, new.card, new.description, new.todo,
+            new.attachments);
+END;
+CREATE TRIGGER IF NOT EXISTS cards_delete AFTER DELETE ON cards BEGIN
+    INSERT INTO cards_fts
+        (cards_fts, rowid, board, list, card, description, todo, attachments)
+    VALUES ('delete', old.rowid, old.board, old.list, old.card, old.description,
+            old.todo, old.attachments);
+END;
+CREATE TRIGGER IF NOT EXISTS cards_update AFTER UPDATE ON cards BEGIN
+    INSERT INTO cards_fts
+        (cards_fts, rowid, board, list, card, description, todo, attachments)
+    VALUES ('delete', old.rowid, old.board, old.list, old.card, old.description,
+            old.todo, old.attachments);
+    INSERT INTO cards_fts (rowid, board, list, card, description, todo, attachments)
+    VALUES (new.rowid, new.board, new.list, new.card, new.description, new.todo,
+            new.attachments);
+END;
+"""
+
+
+class SearchHit(NamedTuple):
+    """ Card matching a search """
+
+    board: str
+    list: str
+    card: str
+    card_id: str
+    snippet: str
+
+    def __str__(self) -> str:
+        return f"{self.board} / {self.list} / {self.card}\n    {self.snippet}"
+
+
+def fts_query(text: str) -> str:
+    """
+    FTS5 query matching every word of text
+
+    Words are quoted, so punctuation is not FTS5 syntax, and the last word
+    matches as a prefix.
+    """
+    words = [f'"{word}"' for word in re.findall(r"[^\s\"]+", text)]
+    if words:
+        words[-1] += "*"
+    return " ".join(words)
+
+
+class SearchIndex:
+    """ sqlite FTS5 index of the cards of dumped boards """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """ Close the database """
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def is_current(self, board_id: str, last_activity: Optional[str]) -> bool:
+        """ Whether the board is indexed as of last_activity """
+        row = self.db.execute(
+            "SELECT last_activity FROM boards WHERE id = ?", (board_id,)
+        ).fetchone()
+        return row is not None and last_activity is not None and row[0] == last_activity
+
+    def index_board(self, board: Board) -> bool:
+        """ Bring the index up to date with board, return False if it already was """
+
+        if self.is_current(board.id, board.last_activity):
+            return False
+
+        db = self.db
+        indexed: Dict[str, tuple] = {
+            row[0]: row[1:]
+            for row in db.execute(
+                "SELECT card_id, rowid, board_id, list_id, board, list, card, "
+                "description, todo, attachments FROM cards WHERE board_id = ?",
+                (board.id,),
+            )
+        }
+        board_name = board.name.strip()
+        with db:
+            for row in export_rows(board.lists, INDEX_COLUMNS):
+                text = (
+                    board.id,
+                    row["list_id"],
+                    board_name,
+                    row["list"],
+                    row["card"],
+                    row["description"],
+                    row["todo"],
+                    row["attachments"],
+                )
+                old = indexed.pop(row["card_id"], None)
+                if old is None:  # a new card, or one moved from another board
+                    db.execute(
+                        "INSERT INTO cards (card_id, board_id, list_id, board, list, "
+                        "card, description, todo, attachments) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (card_id) DO UPDATE SET "
+                        "board_id = excluded.board_id, list_id = excluded.list_id, "
+                        "board = excluded.board, list = excluded.list, "
+                        "card = excluded.card, description = excluded.description, "
+                        "todo = excluded.todo, attachments = excluded.attachments",
+                        (row["card_id"],) + text,
+                    )
+                elif old[1:] != text:
+                    db.execute(
+                        "UPDATE cards SET board_id = ?, list_id = ?, board = ?, "
+                        "list = ?, card = ?, description = ?, todo = ?, "
+                        "attachments = ? WHERE rowid = ?",
+                        text + (old[0],),
+                    )
+            db.executemany(
+                "DELETE FROM cards WHERE rowid = ?",
+                ((old[0],) for old in indexed.values()),
+            )
+            db.execute(
+                "INSERT INTO boards (id, name, last_activity) VALUES (?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET "
+                "name = excluded.name, last_activity = excluded.last_activity",
+                (board.id, board_name, board.last_activity),
+            )
+        return True
+
+    def search(
+        self, query: str, limit: int = 20, board: Optional[str] = None, raw=False
+    ) -> List[SearchHit]:
+        """
+        Best matches of query, most relevant first
+
+        raw passes query to FTS5 unchanged, for its AND/OR/NEAR and column syntax.
+        board restricts the search to the board with that name or id.
+        """
+
+        match = query if raw else fts_query(query)
+        if not match:
+            return []
+        where = "cards_fts MATCH ?"
+        params: list = [match]
+        if board:
+            where += " AND (cards.board_id = ? OR cards.board = ?)"
+            params += [board, board]
+        rows = self.db.execute(
+            "SELECT cards.board, cards.list, cards.card, cards.card_id, "
+            "snippet(cards_fts, -1, '[', ']', '...', 12) "
+            "FROM cards_fts JOIN cards ON cards.rowid = cards_fts.rowid "
+            f"WHERE {where} ORDER BY rank LIMIT ?",
+            params + [limit],
+        )
+        return [SearchHit(*row) for row in rows]
+
+    def stats(self) -> str:
+        """ Number of indexed boards and cards """
+        boards = self.db.execute("SELECT count(*) FROM boards").fetchone()[0]
+        cards = self.db.execute("SELECT count(*) FROM cards").fetchone()[0]
+        return f"{cards} cards of {boards} boards indexed in {self.path}"
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+
+"""
+Incremental board fetch
+
+The json of the last dump of each board is kept as a snapshot.
+On the next dump only the board actions since that snapshot are read,
+the cards they touch are fetched again and patched into the snapshot,
+so a small change to a large board costs a few requests.
+
+A snapshot holds the card data of the export columns it was fetched for.
+A dump needing other columns fetches the board whole again, for the columns
+of both, so the snapshot covers either from then on.
+"""
+
+import gzip
+import json
+from functools import partial
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from trello.exceptions import ResourceUnavailable
+
+from trellod.api import PAGE_LIMIT, TrelloApi
+from trellod.engine import FetchEngine
+from trellod.export import COLUMNS
+from trellod.fetch import fetch_board_json, fetch_params
+from trellod.model import Board
+
+FULL_FETCH_REQUESTS = 2  # board header and last card page of a full fetch
+
+CARD_ACTIONS = (
+    "createCard",
+    "copyCard",
+    "updateCard",
+    "deleteCard",
+    "moveCardToBoard",
+    "moveCardFromBoard",
+    "convertToCardFromCheckItem",
+    "addChecklistToCard",
+    "removeChecklistFromCard",
+    "updateChecklist",
+    "createCheckItem",
+    "updateCheckItem",
+    "updateCheckItemStateOnCard",
+    "deleteCheckItem",
+    "addAttachmentToCard",
+    "deleteAttachmentFromCard",
+)
+
+LIST_ACTIONS = (
+    "createList",
+    "updateList",
+    "moveListToBoard",
+    "moveListFromBoard",
+)
+
+BOARD_ACTIONS = ("updateBoard",)
+
+
+class Snapshot:
+    """ Board json saved at the end of a dump, with the time it was taken """
+
+    def __init__(self, folder: Path, board_id: str):
+        self.path = Path(folder) / f"{board_id}.json.gz"
+
+    def load(self) -> Optional[dict]:
+        """ Return the saved snapshot, or None """
+        if not self.path.is_file():
+            return None
+        with gzip.open(self.path, "rt", encoding="utf-8") as input_:
+            return json.load(input_)
+
+    def save(self, board_json: dict, since: str, columns: Tuple[str, ...]) -> None:
+        """ Save board_json, fetched for columns, as a snapshot of the board at since """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_suffix(".tmp")
+        with gzip.open(temp, "wt", encoding="utf-8") as output:
+            json.dump(dict(since=since, board=board_json, columns=columns), output)
+        temp.replace(self.path)
+
+
+def snapshot_columns(
+    saved: Optional[dict], columns: Optional[Iterable[str]]
+) -> Tuple[Tuple[str, ...], bool]:
+    """
+    (columns to fetch, whether saved can be patched) for a dump of columns
+
+    Without columns every column is wanted.  A snapshot lacking some of
+    them, or saved before snapshots named theirs, must be fetched again.
+    """
+
+    wanted = set(COLUMNS if columns is None else columns)
+    if saved is None or "columns" not in saved:
+        return tuple(sorted(wanted)), False
+    held = set(saved["columns"])
+    return tuple(sorted(wanted | held)), wanted <= held
+
+
+def touched_cards(actions: List[dict]) -> Set[str]:
+    """ Ids of the cards touched by actions """
+    return {
+        action["data"]["card"]["id"]
+        for action in actions
+        if "card" in action.get("data", {})
+    }
+
+
+def touched_lists(actions: Iterable[dict]) -> Set[str]:
+    """ Ids of the lists actions name, a moved card naming both of its lists """
+    lists = set()
+    for action in actions:
+        data = action.get("data", {})
+        for key in ("list", "listBefore", "listAfter"):
+            if "id" in data.get(key, {}):
+                lists.add(data[key]["id"])
+        if "idList" in data.get("card", {}):
+            lists.add(data["card"]["idList"])
+    return lists
+
+
+def fetch_card(api: TrelloApi, card_id: str, card_params: dict) -> Optional[dict]:
+    """ Fetch card card_id as fetch_board_json does, or None if it was deleted """
+    params = dict(card_params, fields=f"{card_params['fields']},closed")
+    try:
+        return api.get(f"/cards/{card_id}", **params)
+    except ResourceUnavailable as error:
+        if error._status == 404:  # pylint: disable=protected-access
+            return None
+        raise
+
+
+def fetch_list_cards(api: TrelloApi, list_id: str, card_params: dict) -> List[dict]:
+    """ Fetch the open cards of list list_id as fetch_board_json does """
+    return list(api.paginate(f"/lists/{list_id}/cards", **card_params))
+
+
+def full_fetch_requests(board_json: dict) -> int:
+    """ Requests fetch_board_json makes for a board the size of board_json """
+    return FULL_FETCH_REQUESTS + len(board_json["cards"]) // PAGE_LIMIT
+
+
+def patch_requests(actions: List[dict]) -> int:
+    """ Requests patch_board_json makes for actions, at most """
+    list_actions = [action for action in actions if action.get("type") in LIST_ACTIONS]
+    return 1 + len(touched_lists(list_actions)) + len(touched_cards(actions))
+
+
+def patch_board_json(
+    api: TrelloApi,
+    board_json: dict,
+    actions: List[dict],
+    engine: Optional[FetchEngine] = None,
+    columns: Optional[Iterable[str]] = None,
+) -> dict:
+    """
+    Apply actions to board_json by fetching the lists and cards they touch
+
+    The cards of lists named by list actions are fetched again whole.
+    The data of columns is fetched, as board_json was.
+    """
+
+    board_params, card_params = fetch_params(columns)
+    board_id = board_json["id"]
+    header = api.get(f"/boards/{board_id}", **board_params)
+    open_lists = {list_["id"] for list_ in header["lists"]}
+
+    cards: Dict[str, dict] = {card["id"]: card for card in board_json["cards"]}
+
+    # a list moved in or reopened brings cards no card action names
+    list_actions = [action for action in actions if action.get("type") in LIST_ACTIONS]
+    list_ids = sorted(touched_lists(list_actions) & open_lists)
+    fetch_list = partial(fetch_list_cards, api, card_params=card_params)
+    lists = engine.map(fetch_list, list_ids) if engine else map(fetch_list, list_ids)
+    refetched = set(list_ids)
+    cards = {
+        card_id: card
+        for card_id, card in cards.items()
+        if card["idList"] not in refetched
+    }
+    for list_cards in lists:
+        cards.update((card["id"], card) for card in list_cards)
+
+    card_ids = sorted(touched_cards(actions))
+    fetch = partial(fetch_card, api, card_params=card_params)
+    fetched = engine.map(fetch, card_ids) if engine else map(fetch, card_ids)
+
+    for card_id, card in zip(card_ids, fetched):
+        cards.pop(card_id, None)
+        if card and not card.pop("closed", False) and card["idList"] in open_lists:
+            cards[card_id] = card
+
+    header["cards"] = list(cards.values())
+    return header
+
+
+def fetch_board_incremental(
+    api: TrelloApi,
+    board_id: str,
+    folder: Path,
+    engine: Optional[FetchEngine] = None,
+    columns: Optional[Iterable[str]] = None,
+) -> Board:
+    """
+    Fetch board board_id with the data of columns, patching the last snapshot
+
+    Falls back to a full fetch when there is no snapshot, it lacks some of
+    columns, or patching it takes more requests than a full fetch: one per
+    card and list touched since it, against one per page of cards.
+    """
+
+    snapshot = Snapshot(folder, board_id)
+    saved = snapshot.load()
+    columns, patchable = snapshot_columns(saved, columns)
+
+    board_json = None
+    if patchable:
+        pages = api.paginate(
+            f"/boards/{board_id}/actions",
+            filter=",".join(CARD_ACTIONS + LIST_ACTIONS + BOARD_ACTIONS),
+            since=saved["since"],
+            fields="type,date,data",
+        )
+        # reading more pages of actions than a full fetch reads is not cheaper
+        full = full_fetch_requests(saved["board"])
+        actions = list(islice(pages, full * PAGE_LIMIT))
+        if not actions:
+            board_json = saved["board"]
+            since = saved["since"]
+        elif len(actions) < full * PAGE_LIMIT and patch_requests(actions) <= full:
+            board_json = patch_board_json(api, saved["board"], actions, engine, columns)
+            since = actions[0]["date"]  # newest first
+
+    if board_json is None:
+        board_json = fetch_board_json(api, board_id, engine, columns)
+        since = board_json["dateLastActivity"]
+
+    snapshot.save(board_json, since, columns)
+    return Board(board_json)
+
+
+def apply_actions(
+    api: TrelloApi,
+    board_id: str,
+    folder: Path,
+    actions: List[dict],
+    engine: Optional[FetchEngine] = None,
+    columns: Optional[Iterable[str]] = None,
+) -> Optional[Board]:
+    """
+    Patch the snapshot of board_id with actions already in hand
+
+    As webhooks deliver them, so the board's actions are not read again.
+    The snapshot keeps the time its actions were last read, so a later
+    fetch_board_incremental sees any action a missed webhook carried.
+    Returns None when no action changes what a dump holds.
+    """
+
+    actions = [
+        action
+        for action in actions
+        if action.get("type") in CARD_ACTIONS + LIST_ACTIONS + BOARD_ACTIONS
+    ]
+    if not actions:
+        return None
+
+    snapshot = Snapshot(folder, board_id)
+    saved = snapshot.load()
+    columns, patchable = snapshot_columns(saved, columns)
+    if not patchable:
+        board_json = fetch_board_json(api, board_id, engine, columns)
+        since = board_json["dateLastActivity"]
+    else:
+        board_json = patch_board_json(api, saved["board"], actions, engine, columns)
+        # webhooks can be missed, so the next incremental fetch reads every
+        # action since the board's actions were last read, not since these
+        since = saved["since"]
+    snapshot.save(board_json, since, columns)
+    return Board(board_json)
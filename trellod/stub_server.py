@@ -0,0 +1,482 @@
+#!/usr/bin/env python
+
+"""
+Local stand-in for the Trello REST endpoints trellod uses
+
+Serves synthetic boards over HTTP on localhost so the fetch engine,
+rate limiter and retry logic can be exercised without a Trello account.
+Every Nth request can be answered with a 429 to exercise Retry-After handling.
+The actions recorded by update_card can be replayed as signed webhook
+callbacks with webhook_payloads and replay_webhooks.
+"""
+
+import itertools
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional
+from urllib.error import HTTPError
+from urllib.parse import parse_qs, urlparse
+from urllib.request import Request, urlopen
+
+PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+_ids = itertools.count(1)
+
+
+def trello_id(timestamp: Optional[float] = None) -> str:
+    """ New id in Trello's format, its first 8 hex digits the creation time """
+    seconds = int(time.time() if timestamp is None else timestamp)
+    return f"{seconds:08x}{next(_ids):016x}"
+
+
+def trello_date(timestamp: float) -> str:
+    """ timestamp in Trello's date format """
+    date = datetime.fromtimestamp(timestamp, timezone.utc)
+    return date.strftime("%Y-%m-%dT%H:%M:%S.") + f"{date.microsecond // 1000:03d}Z"
+
+
+def synthetic_actions(board: dict, num_actions: int, days: float = 365) -> list:
+    """ num_actions comments, moves and renames of board's cards, newest first """
+
+    cards, lists, members = board["cards"], board["lists"], board["members"]
+    start = time.time() - days * 86400
+    actions = []
+    for index in range(num_actions):
+        timestamp = start + days * 86400 * index / num_actions
+        card = cards[index * 7919 % len(cards)]
+        data = dict(
+            card=dict(id=card["id"], name=card["name"], idList=card["idList"]),
+            board=dict(id=board["id"], name=board["name"]),
+        )
+        kind = index % 3
+        if kind == 0:
+            data["text"] = f"Comment {index} on {card['name']}"
+        elif kind == 1:
+            data["listBefore"] = dict(id=lists[0]["id"], name=lists[0]["name"])
+            data["listAfter"] = dict(id=lists[-1]["id"], name=lists[-1]["name"])
+            data["old"] = dict(idList=lists[0]["id"])
+        else:
+            data["old"] = dict(name=f"Old name {index}")
+        member = members[index % len(members)]
+        actions.append(
+            dict(
+                id=trello_id(timestamp),
+                type="commentCard" if kind == 0 else "updateCard",
+                date=trello_date(timestamp),
+                idMemberCreator=member["id"],
+                memberCreator=dict(id=member["id"], fullName=member["fullName"]),
+                data=data,
+            )
+        )
+    actions.reverse()
+    return actions
+
+
+def synthetic_board(
+    board_id: str,
+    base_url: str,
+    num_lists: int = 5,
+    num_cards: int = 100,
+    checklist_items: int = 3,
+    attachments: int = 1,
+    num_actions: int = 0,
+) -> dict:
+    """
+    Return json for a board of num_cards cards spread over num_lists lists
+
+    with num_actions card actions over the last year.
+    """
+
+    lists = [
+        dict(id=f"{board_id}l{index}", name=f"List {index}", pos=index, closed=False)
+        for index in range(num_lists)
+    ]
+    labels = [
+        dict(id=f"{board_id}b{index}", name=color.title(), color=color)
+        for index, color in enumerate(("green", "yellow", "red"))
+    ]
+    members = [
+        dict(
+            id=f"{board_id}m{index}", username=f"user{index}", fullName=f"User {index}"
+        )
+        for index in range(2)
+    ]
+    cards = []
+    for index in range(num_cards):
+        card_id = f"{board_id}c{index}"
+        checklist = dict(
+            id=f"{card_id}k",
+            idCard=card_id,
+            name="Todo",
+            pos=0,
+            checkItems=[
+                dict(id=f"{card_id}i{item}", name=f"Item {item}", pos=item)
+                for item in range(checklist_items)
+            ],
+        )
+        cards.append(
+            dict(
+                id=card_id,
+                name=f"Card {index}",
+                desc=f"Description of card {index}",
+                idList=lists[index % num_lists]["id"],
+                pos=index,
+                closed=False,
+                idLabels=[labels[index % len(labels)]["id"]],
+                idMembers=[members[index % len(members)]["id"]],
+                checklists=[checklist] if checklist_items else [],
+                attachments=[
+                    dict(
+                        id=f"{card_id}a{attachment}",
+                        name=f"image{attachment}.png",
+                        url=f"{base_url}/attachments/{card_id}a{attachment}.png",
+                        mimeType="image/png",
+                        bytes=len(PNG),
+                    )
+                    for attachment in range(attachments)
+                ],
+            )
+        )
+    board = dict(
+        id=board_id,
+        name=f"Board {board_id}",
+        shortLink=board_id.rjust(8, "x")[-8:],
+        closed=False,
+        dateLastActivity="2020-12-01T00:00:00.000Z",
+        lists=lists,
+        labels=labels,
+        members=members,
+        cards=cards,
+        actions=[],
+    )
+    if num_actions and cards:
+        board["actions"] = synthetic_actions(board, num_actions)
+    return board
+
+
+def page(items: list, query: dict) -> list:
+    """ Apply Trello's before/limit paging to items, newest id first """
+    items = sorted(items, key=lambda item: item["id"], reverse=True)
+    if "before" in query:
+        items = [item for item in items if item["id"] < query["before"]]
+    if "limit" in query:
+        items = items[: int(query["limit"])]
+    return items
+
+
+def project(card: dict, board: dict, query: dict) -> dict:
+    """
+    Card json as Trello returns it for query's fields and nested resources
+
+    Without fields every field is returned, as Trello does.
+    """
+
+    if "fields" not in query:
+        return card
+    data = dict(id=card["id"])
+    for field in query["fields"].split(","):
+        if field == "labels":
+            labels = {label["id"]: label for label in board["labels"]}
+            data["labels"] = [labels[id_] for id_ in card.get("idLabels", [])]
+        elif field == "url":
+            data["url"] = f"https://trello.com/c/{card['id']}/{card['name']}"
+        elif field == "shortUrl":
+            data["shortUrl"] = f"https://trello.com/c/{card['id']}"
+        elif field in card:
+            data[field] = card[field]
+    if query.get("checklists", "none") != "none":
+        data["checklists"] = card["checklists"]
+    if query.get("attachments", "false") != "false":
+        data["attachments"] = card["attachments"]
+    return data
+
+
+def with_state(cards: list, state: Optional[str]) -> list:
+    """ cards passing Trello's card filter state: open, closed or all """
+    if state == "all":
+        return cards
+    closed = state == "closed"
+    return [card for card in cards if bool(card.get("closed")) == closed]
+
+
+def trello_now() -> str:
+    """ Current time in Trello's date format """
+    return trello_date(time.time())
+
+
+class StubTrello(ThreadingHTTPServer):
+    """ Threaded HTTP server holding synthetic boards """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, throttle_every: int = 0, latency: float = 0.0):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.boards: Dict[str, dict] = {}
+        self.throttle_every = throttle_every
+        self.latency = latency
+        self.request_count = 0
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """ Base url of the server """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self) -> str:
+        """ Base url to pass to TrelloApi """
+        return f"{self.url}/1"
+
+    def add_board(self, **kwargs) -> dict:
+        """ Create a synthetic board served at this server's url """
+        board = synthetic_board(base_url=self.url, **kwargs)
+        self.boards[board["id"]] = board
+        return board
+
+    def update_card(self, board_id: str, card_id: str, **fields) -> None:
+        """ Change a card and record the updateCard action Trello would """
+        board = self.boards[board_id]
+        card = next(card for card in board["cards"] if card["id"] == card_id)
+        card.update(fields)
+        date = trello_now()
+        board["dateLastActivity"] = date
+        board["actions"].insert(
+            0,
+            dict(
+                id=trello_id(),
+                type="updateCard",
+                date=date,
+                data=dict(
+                    card=dict(id=card_id, name=card["name"]),
+                    list=dict(id=card["idList"]),
+                    board=dict(id=board_id, name=board["name"]),
+                ),
+            ),
+        )
+
+    def count(self) -> int:
+        """ Count a request and return the running total """
+        with self.lock:
+            self.request_count += 1
+            return self.request_count
+
+    def start(self) -> "StubTrello":
+        """ Serve on a background thread """
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """ Stop serving and close the socket """
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def webhook_payloads(server: StubTrello, board_id: str) -> List[dict]:
+    """ Webhook bodies Trello would send for the recorded actions, oldest first """
+    board = server.boards[board_id]
+    model = dict(id=board_id, name=board["name"])
+    return [dict(action=action, model=model) for action in reversed(board["actions"])]
+
+
+def replay_webhooks(
+    callback_url: str, payloads: Iterable[dict], secret: str
+) -> List[int]:
+    """ POST payloads to callback_url signed with secret, return the statuses """
+    from trellod.webhook import signature  # pylint: disable=import-outside-toplevel
+
+    statuses = []
+    for payload in payloads:
+        body = json.dumps(payload).encode()
+        request = Request(
+            callback_url,
+            data=body,
+            headers={
+                "Content-Type": "application/json",
+                "X-Trello-Webhook": signature(secret, body, callback_url),
+            },
+        )
+        try:
+            with urlopen(request) as response:
+                statuses.append(response.status)
+        except HTTPError as error:
+            statuses.append(error.code)
+    return statuses
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """ Answer the subset of the Trello REST API used by trellod """
+
+    routes = (
+        (re.compile(r"^/1/members/me/boards$"), "member_boards"),
+        (re.compile(r"^/1/members/me/organizations$"), "member_organizations"),
+        (re.compile(r"^/1/boards/(\w+)$"), "board"),
+        (re.compile(r"^/1/boards/(\w+)/lists$"), "board_lists"),
+        (re.compile(r"^/1/boards/(\w+)/cards(?:/(\w+))?$"), "board_cards"),
+        (re.compile(r"^/1/boards/(\w+)/actions$"), "board_actions"),
+        (re.compile(r"^/1/cards/(\w+)$"), "card"),
+        (re.compile(r"^/1/lists/(\w+)/cards(?:/(\w+))?$"), "list_cards"),
+        (re.compile(r"^/attachments/(\w+)\.png$"), "attachment"),
+    )
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """ Dispatch a GET request to its route """
+
+        server: StubTrello = self.server
+        count = server.count()
+        if server.latency:
+            time.sleep(server.latency)
+        if server.throttle_every and count % server.throttle_every == 0:
+            self.send_json(
+                {"message": "API_TOKEN_LIMIT_EXCEEDED"}, 429, {"Retry-After": "0"}
+            )
+            return
+
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        for pattern, name in self.routes:
+            match = pattern.match(url.path)
+            if match:
+                getattr(self, name)(query, *match.groups())
+                return
+        self.send_json({"message": "not found"}, 404)
+
+    def send_json(self, data, status: int = 200, headers: Optional[dict] = None):
+        """ Write data as a json response """
+        body = json.dumps(data).encode()
+        self.send_bytes(body, "application/json", status, headers)
+
+    def send_bytes(
+        self, body: bytes, content_type: str, status: int = 200, headers=None
+    ):
+        """ Write body as the response """
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def get_board(self, board_id: str) -> Optional[dict]:
+        board = self.server.boards.get(board_id) or next(
+            (
+                board
+                for board in self.server.boards.values()
+                if board.get("shortLink") == board_id
+            ),
+            None,
+        )
+        if board is None:
+            self.send_json({"message": "board not found"}, 404)
+        return board
+
+    def member_boards(self, query):
+        fields = query.get("fields", "name,closed,dateLastActivity").split(",")
+        wanted = query.get("filter", "all")
+        boards = [
+            {key: board[key] for key in ["id"] + fields if key in board}
+            for board in self.server.boards.values()
+            if wanted == "all" or board["closed"] == (wanted == "closed")
+        ]
+        self.send_json(boards)
+
+    def member_organizations(self, query):
+        self.send_json([])
+
+    def board(self, query, board_id):
+        board = self.get_board(board_id)
+        if board is None:
+            return
+        data = {key: board[key] for key in ("id", "name", "closed", "dateLastActivity")}
+        for nested in ("lists", "labels", "members"):
+            if query.get(nested):
+                data[nested] = board[nested]
+        if query.get("cards"):
+            data["cards"] = board["cards"]
+        self.send_json(data)
+
+    def board_lists(self, query, board_id):
+        board = self.get_board(board_id)
+        if board is not None:
+            self.send_json(board["lists"])
+
+    def board_cards(self, query, board_id, state=None):
+        board = self.get_board(board_id)
+        if board is not None:
+            cards = page(with_state(board["cards"], state), query)
+            self.send_json([project(card, board, query) for card in cards])
+
+    def board_actions(self, query, board_id):
+        board = self.get_board(board_id)
+        if board is None:
+            return
+        since = query.pop("since", "")
+        key = "id" if re.fullmatch(r"[0-9a-f]{24}", since) else "date"
+        actions = [action for action in board["actions"] if action[key] > since]
+        self.send_json(page(actions, dict(dict(limit=50), **query)))
+
+    def card(self, query, card_id):
+        for board in self.server.boards.values():
+            for card in board["cards"]:
+                if card["id"] == card_id:
+                    self.send_json(project(card, board, query))
+                    return
+        self.send_json({"message": "card not found"}, 404)
+
+    def list_cards(self, query, list_id, state=None):
+        for board in self.server.boards.values():
+            if any(list_["id"] == list_id for list_ in board["lists"]):
+                cards = [card for card in board["cards"] if card["idList"] == list_id]
+                cards = page(with_state(cards, state), query)
+                self.send_json([project(card, board, query) for card in cards])
+                return
+        self.send_json({"message": "list not found"}, 404)
+
+    def attachment(self, query, attachment_id):
+        self.send_bytes(PNG, "image/png")
+
+
+def demo():
+    """ Dump a synthetic board from the stub server with the concurrent engine """
+
+    from trello import TrelloClient  # pylint: disable=import-outside-toplevel
+
+    from trellod.api import TrelloApi  # pylint: disable=import-outside-toplevel
+    from trellod.engine import FetchEngine  # pylint: disable=import-outside-toplevel
+    from trellod.fetch import fetch_board  # pylint: disable=import-outside-toplevel
+
+    with StubTrello(throttle_every=2, latency=0.05) as server:
+        server.add_board(board_id="demo", num_lists=4, num_cards=200)
+        api = TrelloApi(TrelloClient(api_key="key"), base_url=server.api_url)
+        with FetchEngine(workers=4) as engine:
+            start = time.perf_counter()
+            board = fetch_board(api, "demo", engine)
+            elapsed = time.perf_counter() - start
+        print(
+            f"{board.name}: {sum(1 for _ in board.cards)} cards in {elapsed:.2f}s, "
+            f"{api.request_count} requests, {api.retry_count} retried"
+        )
+
+
+if __name__ == "__main__":
+    demo()
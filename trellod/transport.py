@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+"""
+Shared HTTP transport
+
+Every HTTP request trellod makes goes through sessions configured by one
+Transport: the OAuth handshake, the REST calls of py-trello and TrelloApi,
+and attachment downloads.  The sessions share its adapters, whose keep-alive
+connection pools are kept per host, so a large dump pays for a TLS handshake
+per pooled connection rather than per request.  Responses are requested
+compressed, requests without a timeout get the transport's, and failed
+connections are retried.  The transport counts requests, bytes on the wire
+and retries for diagnostics.
+
+Throttled (429) and failed (5xx) responses are left to TrelloApi, which
+honors Retry-After.
+"""
+
+import threading
+from typing import Dict, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+from trellod.engine import DEFAULT_WORKERS
+
+DEFAULT_TIMEOUT = (10.0, 60.0)  # connect, read seconds
+POOL_HOSTS = 4  # api.trello.com, trello.com and the attachment hosts
+CONNECT_RETRIES = 3
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class TransportStats:
+    """ Thread-safe request, byte and retry counters """
+
+    def __init__(self):
+        self.request_count = 0
+        self.bytes_received = 0
+        self.retry_count = 0
+        self._lock = threading.Lock()
+
+    def add(self, requests_: int = 0, bytes_: int = 0, retries: int = 0) -> None:
+        """ Add to the counters """
+        with self._lock:
+            self.request_count += requests_
+            self.bytes_received += bytes_
+            self.retry_count += retries
+
+    def __str__(self):
+        return (
+            f"{self.request_count} HTTP requests, "
+            f"{self.bytes_received / 2 ** 20:.1f} MiB received, "
+            f"{self.retry_count} retried"
+        )
+
+
+class PoolAdapter(HTTPAdapter):
+    """ HTTPAdapter with a default timeout that counts what it sends """
+
+    def __init__(
+        self, stats: TransportStats, timeout: Timeout, pool_size: int, retries: int
+    ):
+        self.stats = stats
+        self.timeout = timeout
+        super().__init__(
+            pool_connections=POOL_HOSTS,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries, status=0, backoff_factor=0.5, raise_on_status=False
+            ),
+        )
+
+    def send(self, request, timeout=None, **kwargs):  # pylint: disable=arguments-differ
+        response = super().send(request, timeout=timeout or self.timeout, **kwargs)
+        retries = getattr(response.raw, "retries", None)
+        self.stats.add(1, retries=len(retries.history) if retries else 0)
+        self._count_body(response.raw)
+        return response
+
+    def _count_body(self, raw) -> None:
+        """ Count the bytes read from the wire once the body is released """
+        release_conn = raw.release_conn
+        counted = []
+
+        def release() -> None:
+            if not counted:
+                counted.append(True)
+                self.stats.add(bytes_=raw.tell())
+            release_conn()
+
+        raw.release_conn = release
+
+
+class Transport:
+    """
+    Connection pools and settings shared by every session trellod opens
+
+    pool_size connections are kept per host, or host_pool_sizes[host] for
+    the hosts it names, as "api.trello.com" or "host:port".
+    """
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_WORKERS,
+        timeout: Timeout = DEFAULT_TIMEOUT,
+        host_pool_sizes: Optional[Dict[str, int]] = None,
+        retries: int = CONNECT_RETRIES,
+    ):
+        self.stats = TransportStats()
+        default = PoolAdapter(self.stats, timeout, pool_size, retries)
+        self.adapters: Dict[str, HTTPAdapter] = {
+            "https://": default,
+            "http://": default,
+        }
+        for host, size in (host_pool_sizes or {}).items():
+            adapter = PoolAdapter(self.stats, timeout, size, retries)
+            self.adapters[f"https://{host}/"] = adapter
+            self.adapters[f"http://{host}/"] = adapter
+
+    def configure(self, session: requests.Session) -> requests.Session:
+        """ Route session, of any Session class, through the shared pools """
+        for prefix, adapter in self.adapters.items():
+            session.mount(prefix, adapter)
+        session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        return session
+
+    def session(self) -> requests.Session:
+        """ New session over the shared pools """
+        return self.configure(requests.Session())
+
+    def close(self) -> None:
+        """ Close the pooled connections """
+        for adapter in set(self.adapters.values()):
+            adapter.close()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+"""
+Board model from Trello's "Export as JSON" file
+
+The export is one object holding the board's fields and arrays of its
+actions, cards, lists, checklists and more, with the cards before the lists.
+read_board_export streams it with trellod.jsonstream, turning each open card
+into a Card as it is read and skipping actions element by element, so memory
+holds the board model and one element of the file rather than the whole file.
+"""
+
+import json
+from pathlib import Path
+from typing import List
+
+from trellod.jsonstream import CHUNK_SIZE, iter_members
+from trellod.model import Board, Card
+
+HEADER_FIELDS = ("id", "name", "dateLastActivity")
+
+
+def compact_checklist(checklist: dict) -> dict:
+    """ The parts of checklist json the model uses """
+    return dict(
+        id=checklist["id"],
+        idCard=checklist.get("idCard"),
+        name=checklist.get("name"),
+        pos=checklist.get("pos", 0),
+        checkItems=[
+            dict(name=item["name"], pos=item.get("pos", 0))
+            for item in checklist.get("checkItems", [])
+        ],
+    )
+
+
+def read_board_export(path: Path, chunk_size: int = CHUNK_SIZE) -> Board:
+    """ Board model of the open lists and cards of an "Export as JSON" file """
+
+    header = dict(lists=[])
+    cards: List[Card] = []
+    checklists: List[dict] = []
+    with open(path, encoding="utf-8") as file:
+        arrays = ("lists", "cards", "checklists", "members")
+        for key, value in iter_members(file, arrays, chunk_size):
+            if key == "cards":
+                if not value.get("closed"):
+                    cards.append(Card(value))
+            elif key == "checklists":
+                checklists.append(compact_checklist(value))
+            elif key == "lists":
+                if not value.get("closed"):
+                    header["lists"].append(value)
+            elif key == "members":
+                header.setdefault("members", []).append(value)
+            elif key in HEADER_FIELDS:
+                header[key] = value
+
+    if "id" not in header:
+        raise ValueError(f"{path} is not a Trello board export")
+    board = Board(header)
+    board.add_cards(cards)
+    board.add_checklists(checklists)
+    return board
+
+
+def write_synthetic_export(path: Path, board: dict, actions: int = 0) -> None:
+    """
+    Write board json from trellod.stub_server in the layout of an export
+
+    Checklists move to the top level and cards carry their label objects
+    as in Trello's file, and actions filler actions are written first.
+    """
+
+    labels = {label["id"]: label for label in board["labels"]}
+    cards = [
+        dict(
+            {key: value for key, value in card.items() if key != "checklists"},
+            labels=[labels[label_id] for label_id in card["idLabels"]],
+        )
+        for card in board["cards"]
+    ]
+    checklists = [
+        checklist for card in board["cards"] for checklist in card["checklists"]
+    ]
+    with open(path, "w", encoding="utf-8") as output:
+        output.write(json.dumps(dict(id=board["id"], name=board["name"]))[:-1])
+        output.write(', "actions": [')
+        for index in range(actions):
+            action = dict(
+                id=f"{index:024x}",
+                type="commentCard",
+                data=dict(text="x" * 200, board=dict(id=board["id"])),
+            )
+            output.write(("," if index else "") + json.dumps(action))
+        output.write("], ")
+        for key, value in (
+            ("cards", cards),
+            ("lists", board["lists"]),
+            ("checklists", checklists),
+            ("members", board["members"]),
+            ("dateLastActivity", board["dateLastActivity"]),
+        ):
+            output.write(f"{json.dumps(key)}: {json.dumps(value)}, ")
+        output.write('"closed": false}')
+
+
+def demo():
+    """ Convert a synthetic export and report its size and peak traced memory """
+
+    # pylint: disable=import-outside-toplevel
+    import tempfile
+    import time
+    import tracemalloc
+
+    from trellod.stub_server import synthetic_board
+
+    path = Path(tempfile.mkdtemp()) / "board.json"
+    write_synthetic_export(
+        path, synthetic_board("demo", "http://localhost", 10, 20_000), 200_000
+    )
+    tracemalloc.start()
+    start = time.perf_counter()
+    board = read_board_export(path)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(
+        f"{path.stat().st_size / 2 ** 20:.1f} MiB export: "
+        f"{sum(1 for _ in board.cards)} cards in {elapsed:.2f}s, "
+        f"peak {peak / 2 ** 20:.1f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    demo()
@@ -4,218 +4,839 @@
 Trello Dump Utility
 
 Build trello export cli
-  Write <board_name>.csv with columns:
-    <list_name> <card_name> <card_desc> <card_has_todo> <card_has_attach>
+  Write Trello <board_name>.xlsx, or .csv, .jsonl or .parquet with --format,
+  holding each card's list, name, description, todo items and attachments
   Handle logging into trello and storing keys
+  trellod sync mirrors boards to sqlite; trellod export writes from the mirror
+  trellod search finds cards of dumped boards in a local full-text index
+  trellod convert writes a Trello "Export as JSON" file offline
+  trellod serve dumps boards on a schedule; trellod trigger asks it for a dump
+
+With --board, and --no-open, trellod runs without a terminal, for cron and
+CI jobs, exiting with an ExitCode.
 """
 
+import os
 import sys
-import webbrowser
+import time
+from contextlib import contextmanager
+from enum import IntEnum
 from pathlib import Path
-from urllib import request
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import typer
+
+from lib.cli import Style, run
+from lib.cli_select import pick
+from trellod.engine import DEFAULT_WORKERS
+from trellod.export import COLUMNS, EXPORTERS, Exporter, parse_columns
+from trellod.model import Board
+from trellod.profiling import profiler, profiling
+
+# Heavy dependencies (py-trello, requests, yaml, xlsxwriter, sqlite3, ...)
+# are imported in the code paths that use them, so --help and failing
+# argument checks start fast.
+if TYPE_CHECKING:
+    from trello import TrelloClient
 
-import pandas as pd
-from trello import TrelloClient
+    from trellod.filters import CardFilter
 
-from lib.cli import Style
-from lib.cli_select import select
-from lib.config import Config
-from lib.string_util import safe_filename
-from trellod.authorize import authorize
+    from lib.config import Config
+    from trellod.api import TrelloApi
+    from trellod.board_index import BoardEntry
+    from trellod.download import AttachmentStore
+    from trellod.engine import FetchEngine
+    from trellod.transport import Transport
 
 style = Style(fg="green")
+err_style = Style(fg="red")
+
+PROFILE_ENV = "TRELLOD_PROFILE"  # config profile of the account to use
+
+
+class ExitCode(IntEnum):
+    """ Exit status of trellod """
+
+    OK = 0
+    FAILED = 1  # an error not listed below
+    USAGE = 2  # a bad option, as typer exits
+    NOT_FOUND = 3  # no board, list or card found, or no mirror or index to search
+    UNAUTHORIZED = 4  # not logged in, or Trello refused the credentials
+    TRELLO = 5  # Trello or the network failed a request
 
 
-def login(config) -> TrelloClient:
+def login(config, transport: "Transport") -> "TrelloClient":
     """
     Login to Trello
 
     Where token and token_secret come from the 3-legged OAuth process
     To use without 3-legged OAuth, use only api_key and api_secret on client.
+    The client sends its requests over a session of transport.
     """
+    from trello import TrelloClient  # pylint: disable=import-outside-toplevel
+
     return TrelloClient(
         api_key=config.api_key,
         api_secret=config.api_secret,
         token=config.oauth_token,
         token_secret=config.oauth_token_secret,
+        http_service=transport.session(),
     )
 
 
-def select_board(client, board_name=None):
-    """ get client's board named board_name """
+def select_board(
+    config: "Config", api: "TrelloApi", board_name=None, refresh: bool = False
+) -> "BoardEntry":
+    """
+    get the board board_name names, else the open board picked
 
-    boards = [board for board in client.list_boards() if not board.closed]
+    Boards come from the local board index, fetched again when it has
+    expired or refresh is set.  board_name, an id, short link, board url or
+    name, is found in the index however old, so a repeat dump of a board
+    makes no board list request.
+    """
+    # pylint: disable=import-outside-toplevel
+    from trellod.board_index import BoardIndex
 
+    board_index = BoardIndex(board_index_path(config))
     if board_name:
-        for board in boards:
-            if board.name == board_name:
-                return board
+        if refresh:
+            board_index.boards(api, refresh)
+        board = board_index.resolve(api, board_name)
+        if board is None:
+            err_style.echo(f"No board {board_name}")
+            raise typer.Exit(ExitCode.NOT_FOUND)
+        return board
+
+    boards = board_index.open_boards(api, refresh)
+    index = pick(boards, prompt="Select Board", style=style)
+    if index is None:
+        sys.exit(0)
+    return boards[index]
+
+
+def download_images_in_lists(
+    lists, folder: Path, engine: "FetchEngine" = None, session=None, auth=None
+) -> "AttachmentStore":
+    """ Download the images of every card in lists into the store at folder """
+    # pylint: disable=import-outside-toplevel
+    from trellod.download import AttachmentStore
+
+    store = AttachmentStore(folder, session, auth)
+    store.download_cards((card for list_ in lists for card in list_.cards), engine)
+    return store
+
+
+def exporter_for(format_: str) -> Exporter:
+    """ Output backend for --format """
+    if format_ not in EXPORTERS:
+        raise typer.BadParameter(
+            f"{format_} is not one of {', '.join(EXPORTERS)}", param_hint="--format"
+        )
+    return EXPORTERS[format_]
+
+
+def columns_for(text: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """ Export columns of --columns, None for the format's defaults """
+    if text is None:
+        return None
+    try:
+        return parse_columns(text)
+    except ValueError as error:
+        raise typer.BadParameter(str(error), param_hint="--columns") from error
+
+
+def filter_for(terms: List[str]) -> Optional["CardFilter"]:
+    """ Card filter of the --filter terms, None without any """
+    from trellod.filters import parse_filter  # pylint: disable=import-outside-toplevel
+
+    try:
+        return parse_filter(terms)
+    except ValueError as error:
+        raise typer.BadParameter(str(error), param_hint="--filter") from error
+
+
+def with_lists(
+    card_filter: Optional["CardFilter"], text: Optional[str]
+) -> Optional["CardFilter"]:
+    """ card_filter also keeping only the lists of --lists, names or ids """
+    from trellod.filters import CardFilter  # pylint: disable=import-outside-toplevel
+
+    names = tuple(name.strip().casefold() for name in (text or "").split(","))
+    names = tuple(name for name in names if name)
+    if not names:
+        return card_filter
+    card_filter = card_filter or CardFilter()
+    return card_filter._replace(lists=card_filter.lists + names)
+
+
+def missing_lists(board: Board, card_filter: Optional["CardFilter"]) -> List[str]:
+    """ Lists card_filter names that board, after filtering, does not have """
+    if card_filter is None:
+        return []
+    found = {list_.id for list_ in board.lists}
+    found.update(list_.name.strip().casefold() for list_ in board.lists)
+    return [name for name in card_filter.lists if name not in found]
+
+
+@contextmanager
+def exit_codes():
+    """ Exit with the ExitCode of a failed Trello request """
+    # pylint: disable=import-outside-toplevel
+    from requests import RequestException
+    from trello.exceptions import ResourceUnavailable, Unauthorized
+
+    try:
+        yield
+    except Unauthorized as error:
+        err_style.echo(f"Trello refused the credentials: {error}")
+        raise typer.Exit(ExitCode.UNAUTHORIZED) from error
+    except ResourceUnavailable as error:
+        err_style.echo(str(error))
+        not_found = error._status == 404  # pylint: disable=protected-access
+        raise typer.Exit(
+            ExitCode.NOT_FOUND if not_found else ExitCode.TRELLO
+        ) from error
+    except RequestException as error:
+        err_style.echo(f"Trello request failed: {error}")
+        raise typer.Exit(ExitCode.TRELLO) from error
+
+
+def filtered(board: Board, card_filter: Optional["CardFilter"]) -> Board:
+    """ board with only the lists and cards passing card_filter, if any """
+    from trellod.filters import filter_board  # pylint: disable=import-outside-toplevel
+
+    if card_filter is None:
+        return board
+    try:
+        return filter_board(board, card_filter)
+    except ValueError as error:
+        err_style.echo(str(error))
+        raise typer.Exit(ExitCode.USAGE) from error
+
+
+def load_config() -> "Config":
+    """
+    Load the trellod config, creating it on first use
 
-    board_names = [board.name for board in boards]
-    while True:
-        index = select(board_names, prompt="Select Board: ", style=style)
-        if index is None:
-            sys.exit(0)
-        return boards[index]
+    The credentials are those of the profile $TRELLOD_PROFILE names,
+    else of the default profile.
+    """
+    from lib.config import Config  # pylint: disable=import-outside-toplevel
 
+    return Config(
+        basename="trellod",
+        profile=os.environ.get(PROFILE_ENV) or None,
+        api_key=None,
+        api_secret=None,
+        oauth_token=None,
+        oauth_token_secret=None,
+    )
 
-def select_lists(board) -> list:
-    """ TODO """
-    lists = board.open_lists()
 
-    list_names = [f"{list_.name} ({list_.cardsCnt()})" for list_ in lists]
-    title = f"\nBoard:  {board.name}"
-    while True:
-        index = select(list_names, title=title, prompt="Select List: ", style=style)
-        if index is None:
-            return lists
-        return [lists[index]]
+def mirror_path(config: "Config") -> Path:
+    """ Path of the sqlite mirror of trellod sync """
+    return config.path.parent / "trellod.mirror.sqlite"
 
 
-def pad_dict_list(dict_list, padding) -> None:
-    """ make lists in dict_list have the same length by appending padding """
+def search_path(config: "Config") -> Path:
+    """ Path of the full-text index of trellod search """
+    return config.path.parent / "trellod.search.sqlite"
 
-    max_length = max(len(list_) for list_ in dict_list.values())
-    for list_ in dict_list.values():
-        list_ += [padding] * (max_length - len(list_))
 
+def board_index_path(config: "Config") -> Path:
+    """ Path of the cached index of the member's boards, one per profile """
+    if config.profile is None:
+        return config.path.parent / "trellod.boards.json"
+    return config.path.parent / f"trellod.{config.profile}.boards.json"
 
-def column_width(df, field_name, max_width=None) -> int:
-    """ TODO """
 
-    series = df[field_name]
-    width = max(
-        len(str(series.name)),  # len of column name/header
-        series.astype(str).map(len).max(),  # len of largest item
-    )
-    return width if max_width is None else min(width, max_width)
+def socket_path(config: "Config") -> Path:
+    """ Path of the unix socket trellod serve listens on """
+    return config.path.parent / "trellod.sock"
 
 
-def df_to_excel(df, excel, sheet_name, max_width=60):
-    """ TODO """
+def connect(transport: "Transport" = None) -> Tuple["Config", "TrelloClient"]:
+    """
+    Load the config, authorizing on first use, and login to Trello
 
-    num_rows = len(df.index)
-    num_cols = len(df.columns)
+    The OAuth handshake and the client share transport's connection pools.
+    """
+    # pylint: disable=import-outside-toplevel
+    from trellod.authorize import authorize
+    from trellod.transport import Transport
 
-    cell_format = excel.book.add_format(
-        dict(
-            text_wrap=True,
-            align="top",
-            # bg_color="#FFFFDD",
-            border=1,
-            border_color="#808080",
-        )
-    )
+    transport = transport or Transport()
+    config = load_config()
+    if config.api_key is None:
+        if not sys.stdin.isatty():
+            err_style.echo("Not logged in, run trellod at a terminal to authorize")
+            raise typer.Exit(ExitCode.UNAUTHORIZED)
+        config.set(**authorize(transport=transport))
+
+    return config, login(config, transport)
+
+
+def dump(
+    exporter: Exporter,
+    workers: int,
+    cache: bool,
+    cache_stats: bool,
+    incremental: bool,
+    images: bool,
+    history: Optional[str] = None,
+    columns: Optional[Tuple[str, ...]] = None,
+    card_filter: Optional["CardFilter"] = None,
+    refresh_boards: bool = False,
+    board_name: Optional[str] = None,
+    output: Optional[Path] = None,
+) -> Path:
+    """
+    Fetch board board_name, else the board picked, write it with exporter
+    to output, by default Trello <board>, and return the output path
 
-    df.to_excel(
-        excel,
-        sheet_name=sheet_name,
-        index=False,
-    )
-    worksheet = excel.sheets[sheet_name]
-
-    # Hide unused cells
-    worksheet.set_default_row(height=None, hide_unused_rows=True)
-    worksheet.set_column(num_cols, 16383, options=dict(hidden=True))
-
-    options = dict(hidden=False)
-    for col, field_name in enumerate(df):  # loop through all columns
-        width = column_width(df, field_name, max_width)
-        worksheet.set_column(col, col, width, cell_format, options)
-
-    worksheet.autofilter(0, 0, num_rows - 1, num_cols - 1)
-
-
-def dump_trello(filename: str, lists: list) -> None:
-    """ TODO """
-
-    excel = pd.ExcelWriter(
-        filename, engine="xlsxwriter"
-    )  # pylint: disable=abstract-class-instantiated
-
-    sheet_name = "Board"
-    data = {
-        list_.name.strip(): [card.name.strip() for card in list_.list_cards()]
-        for list_ in lists
-    }
-    pad_dict_list(data, "")
-    df = pd.DataFrame(data)
-    df_to_excel(df, excel, sheet_name)
-
-    # Create a Pandas Excel writer using XlsxWriter as the engine.
-    # Convert the dataframe to an XlsxWriter Excel object.
-    # Close the Pandas Excel writer and output the Excel file.
-    for list_ in lists:
-        sheet_name = f"List {list_.name}"
-
-        cards, desc, items, att = [], [], [], []
-        for card in list_.list_cards():
-            cards.append(card.name.strip())
-            desc.append(card.description.strip())
-            items.append(
-                "\n".join(
-                    "\n".join(item["name"].strip() for item in checklist.items)
-                    for checklist in card.checklists
+    history, a format name, also writes the board's card history in that format.
+    Only the card data the columns, images and history use is fetched, and
+    only for the cards passing card_filter.
+    """
+    # pylint: disable=import-outside-toplevel
+    from trellod.api import TrelloApi
+    from trellod.cache import ResponseCache
+    from trellod.engine import FetchEngine
+    from trellod.fetch import covers, fetch_board
+    from trellod.filters import fetch_filtered
+    from trellod.search import INDEX_COLUMNS, SearchIndex
+    from trellod.snapshot import fetch_board_incremental
+    from trellod.transport import Transport
+
+    fetched = exporter.needs(columns)
+    fetched += ("attachments",) * images + ("card",) * bool(history)
+    transport = Transport(pool_size=workers)
+    response_cache = None
+    try:
+        with profiler.phase("authenticate"):
+            config, client = connect(transport)
+
+        if cache:
+            response_cache = ResponseCache(config.path.parent / "trellod.cache.sqlite")
+        api = TrelloApi(client, cache=response_cache)
+        profiler.watch(transport.stats)
+
+        with profiler.phase("select board"):
+            board = select_board(config, api, board_name, refresh_boards)
+        with FetchEngine(workers) as engine:
+            with profiler.phase("fetch board"):
+                if incremental:
+                    folder = config.path.parent / "snapshots"
+                    needed = fetched + (card_filter.needs() if card_filter else ())
+                    board = fetch_board_incremental(
+                        api, board.id, folder, engine, needed
+                    )
+                    board = filtered(board, card_filter)
+                elif card_filter is not None:
+                    board = fetch_filtered(api, board.id, engine, card_filter, fetched)
+                else:
+                    board = fetch_board(api, board.id, engine, fetched)
+            missing = missing_lists(board, card_filter)
+            if missing:
+                err_style.echo(f"No list {', '.join(missing)} on {board.name}")
+                raise typer.Exit(ExitCode.NOT_FOUND)
+            lists = board.lists
+
+            filename = f"Trello {board.name.strip()}{exporter.extension}"
+            if output is not None:
+                filename = str(output)
+            with profiler.phase("write"):
+                exporter.write(filename, lists, columns or exporter.columns)
+            whole = card_filter is None
+            if whole and covers(fetched, INDEX_COLUMNS):
+                with profiler.phase("index"), SearchIndex(search_path(config)) as index:
+                    index.index_board(board)
+            if history:
+                from trellod.history import HISTORY_WRITERS, fetch_history
+
+                history_name = (
+                    f"Trello {board.name.strip()} History{exporter.extension}"
                 )
-            )
+                if output is not None:
+                    history_name = str(
+                        output.with_name(f"{output.stem} History{output.suffix}")
+                    )
+                with profiler.phase("fetch history"):
+                    actions = fetch_history(api, board, engine)
+                with profiler.phase("write history"), actions:
+                    HISTORY_WRITERS[history](history_name, lists, actions)
+                style.echo(f"History: {actions.count} card actions in {history_name}")
+            if images:
+                with profiler.phase("download images"):
+                    folder = Path(f"Trello {board.name.strip()} images")
+                    store = download_images_in_lists(
+                        lists, folder, engine, client.http_service, client.oauth
+                    )
+                style.echo(
+                    f"Images: {store.downloaded} downloaded, "
+                    f"{store.skipped} already present"
+                )
+                for error in store.failed.values():
+                    err_style.echo(f"Image not downloaded: {error}")
+        style.echo(f"Dumped {board.name} using {api.request_count} Trello requests")
+        style.echo(str(transport.stats))
+        for warning in api.warnings:
+            err_style.echo(warning)
+        if response_cache is not None and cache_stats:
+            style.echo(str(response_cache.stats()))
+    finally:
+        transport.close()
+        if response_cache is not None:
+            response_cache.close()
+    return Path(filename)
+
+
+def cli(
+    ctx: typer.Context,
+    account: str = typer.Option(
+        None,
+        envvar=PROFILE_ENV,
+        help="Config profile of the Trello account to use, for every command",
+    ),
+    board: str = typer.Option(
+        None, "--board", "-b", help="Board id, short link, url or name to dump"
+    ),
+    lists: str = typer.Option(
+        None, help="Comma separated names or ids of the lists to dump [default: all]"
+    ),
+    output: Path = typer.Option(None, help="Output file [default: Trello <board>]"),
+    open_: bool = typer.Option(
+        True, "--open/--no-open", help="Open the output when it is written"
+    ),
+    workers: int = typer.Option(
+        DEFAULT_WORKERS, help="Number of concurrent Trello requests"
+    ),
+    cache: bool = typer.Option(
+        False, "--cache/--no-cache", help="Reuse responses for unchanged boards"
+    ),
+    cache_stats: bool = typer.Option(
+        False, "--cache-stats", help="Report response cache hits and size"
+    ),
+    incremental: bool = typer.Option(
+        False, "--incremental", help="Patch the last dump with the board's new actions"
+    ),
+    images: bool = typer.Option(
+        False, "--images", help="Download image attachments next to the workbook"
+    ),
+    history: bool = typer.Option(
+        False, "--history", help="Also export card comments, moves and edits"
+    ),
+    columns: str = typer.Option(
+        None, help=f"Comma separated columns to export: {', '.join(COLUMNS)}"
+    ),
+    filter_: List[str] = typer.Option(
+        [],
+        "--filter",
+        "-f",
+        help="Card filter term, repeatable: list=, label=, member=, "
+        "due>=, due<, activity>=, activity< or state=open|archived|all",
+    ),
+    format_: str = typer.Option(
+        "xlsx", "--format", help=f"Output format: {', '.join(EXPORTERS)}"
+    ),
+    profile: Path = typer.Option(
+        None, help="Write per-phase timings, requests and memory to this json file"
+    ),
+    cprofile: Path = typer.Option(None, help="Write a cProfile dump to this file"),
+    refresh_boards: bool = typer.Option(
+        False, "--refresh-boards", help="Fetch the board list again, not from its cache"
+    ),
+) -> None:
+    """
+    Dump a Trello board to an Excel workbook
 
-            att.append(
-                "\n".join(attachment.url for attachment in card.get_attachments())
-            )
+    Without --board the board is picked at the terminal.
+    """
 
-        df = pd.DataFrame(
-            dict(Card=cards, Description=desc, Todo=items, Attachments=att)
+    if account:
+        os.environ[PROFILE_ENV] = account  # for the command run and its processes
+    if ctx.invoked_subcommand:
+        return
+    exporter = exporter_for(format_)
+    export_columns = columns_for(columns)
+    card_filter = with_lists(filter_for(filter_), lists)
+    if board is None and not sys.stdin.isatty():
+        raise typer.BadParameter("needed without a terminal", param_hint="--board")
+
+    with profiling(profile, cprofile), exit_codes():
+        path = dump(
+            exporter,
+            workers,
+            cache,
+            cache_stats,
+            incremental,
+            images,
+            format_ if history else None,
+            export_columns,
+            card_filter,
+            refresh_boards,
+            board,
+            output,
         )
-        df_to_excel(df, excel, sheet_name)
-
-    excel.save()
-
-
-def download_images(card) -> None:
-    """ TODO """
-    for attachment in card.get_attachments():
-        mime_type = attachment.mime_type.split("/")
-        if mime_type[0] != "image":
-            continue
-        ext = mime_type[1]
-        if ext == "jpeg":
-            ext = "jpg"
-        filename = safe_filename(f"{card.name}.{ext}")
-        request.urlretrieve(attachment.url, filename)
-
 
-def download_images_in_lists(lists) -> None:
-    """ TODO """
-    for list_ in lists:
-        for card in list_.list_cards():
-            download_images(card)
-
-
-def main() -> None:
-    """ TODO """
+    if open_ and format_ != "parquet":
+        import webbrowser  # pylint: disable=import-outside-toplevel
+
+        webbrowser.open(f"file://{path.resolve()}")
+
+
+def batch(
+    board: List[str] = typer.Option(
+        [], "--board", "-b", help="Board name or id to export, repeatable"
+    ),
+    org: List[str] = typer.Option(
+        [], "--org", "-o", help="Organization name or id to export, repeatable"
+    ),
+    output_dir: Path = typer.Option(Path("."), help="Folder for the workbooks"),
+    workers: int = typer.Option(
+        DEFAULT_WORKERS, help="Number of concurrent Trello requests"
+    ),
+    processes: int = typer.Option(
+        None, help="Number of workbook writing processes [default: CPU count]"
+    ),
+    format_: str = typer.Option(
+        "xlsx", "--format", help=f"Output format: {', '.join(EXPORTERS)}"
+    ),
+    columns: str = typer.Option(
+        None, help=f"Comma separated columns to export: {', '.join(COLUMNS)}"
+    ),
+    filter_: List[str] = typer.Option(
+        [],
+        "--filter",
+        "-f",
+        help="Card filter term, repeatable: list=, label=, member=, "
+        "due>=, due<, activity>=, activity< or state=open|archived|all",
+    ),
+) -> None:
+    """ Export every open board, or those matching --board and --org """
+    # pylint: disable=import-outside-toplevel
+    from trellod.api import TrelloApi
+    from trellod.batch import export_boards, list_boards
+    from trellod.search import SearchIndex
+    from trellod.transport import Transport
+
+    exporter = exporter_for(format_)
+    export_columns = columns_for(columns)
+    card_filter = filter_for(filter_)
+    if card_filter is not None and card_filter.state != "open":
+        raise typer.BadParameter(
+            "batch exports open cards, dump one board for state=", param_hint="--filter"
+        )
+    config, client = connect(Transport(pool_size=workers))
+    api = TrelloApi(client)
+
+    boards = list_boards(api, board, org)
+    style.echo(f"Exporting {len(boards)} boards")
+    start = time.perf_counter()
+    with SearchIndex(search_path(config)) as index:
+        results = export_boards(
+            api,
+            boards,
+            output_dir,
+            exporter,
+            workers,
+            processes,
+            index,
+            export_columns,
+            card_filter,
+        )
 
-    config = Config(
-        basename="trellod",
-        api_key=None,
-        api_secret=None,
-        oauth_token=None,
-        oauth_token_secret=None,
+    failures = [result for result in results if result.error]
+    for result in results:
+        (err_style if result.error else style).echo(str(result))
+    style.echo(
+        f"{len(results) - len(failures)} exported, {len(failures)} failed "
+        f"in {time.perf_counter() - start:.1f}s using {api.request_count} requests"
     )
-    if config.api_key is None:
-        config.set(**authorize())
-
-    client = login(config)
-
-    board_name = None
-    board = select_board(client, board_name)
-    # lists = select_lists(board)
-    lists = board.open_lists()
+    for warning in api.warnings:
+        err_style.echo(warning)
+    if failures:
+        raise typer.Exit(ExitCode.FAILED)
+
+
+def sync(
+    board: List[str] = typer.Option(
+        [], "--board", "-b", help="Board name or id to mirror, repeatable"
+    ),
+    org: List[str] = typer.Option(
+        [], "--org", "-o", help="Organization name or id to mirror, repeatable"
+    ),
+    workers: int = typer.Option(
+        DEFAULT_WORKERS, help="Number of concurrent Trello requests"
+    ),
+) -> None:
+    """ Mirror every open board, or those matching --board and --org, to sqlite """
+    # pylint: disable=import-outside-toplevel
+    from trellod.api import TrelloApi
+    from trellod.batch import list_boards
+    from trellod.engine import FetchEngine
+    from trellod.mirror import Mirror
+    from trellod.search import SearchIndex
+    from trellod.transport import Transport
+
+    config, client = connect(Transport(pool_size=workers))
+    api = TrelloApi(client)
+    start = time.perf_counter()
+    boards = list_boards(api, board, org)
+    with Mirror(mirror_path(config)) as mirror, FetchEngine(workers) as engine:
+        synced, skipped = mirror.sync(api, boards, engine)
+        with SearchIndex(search_path(config)) as index:
+            for board_id, last_activity in mirror.activity().items():
+                if not index.is_current(board_id, last_activity):
+                    index.index_board(mirror.load_board(board_id))
+    style.echo(
+        f"{synced} boards synced, {skipped} unchanged "
+        f"in {time.perf_counter() - start:.1f}s using {api.request_count} requests"
+    )
+    for warning in api.warnings:
+        err_style.echo(warning)
+
+
+def export(
+    board: str = typer.Option(
+        None, "--board", "-b", help="Mirrored board name or id [default: select]"
+    ),
+    output: Path = typer.Option(None, help="Output file [default: Trello <board>]"),
+    format_: str = typer.Option(
+        "xlsx", "--format", help=f"Output format: {', '.join(EXPORTERS)}"
+    ),
+    columns: str = typer.Option(
+        None, help=f"Comma separated columns to export: {', '.join(COLUMNS)}"
+    ),
+    filter_: List[str] = typer.Option(
+        [],
+        "--filter",
+        "-f",
+        help="Card filter term, repeatable: list=, label=, member=, "
+        "due>=, due<, activity>=, activity< or state=open|archived|all",
+    ),
+) -> None:
+    """ Export a board from the trellod sync mirror, without the network """
+    from trellod.mirror import Mirror  # pylint: disable=import-outside-toplevel
+
+    exporter = exporter_for(format_)
+    export_columns = columns_for(columns) or exporter.columns
+    card_filter = filter_for(filter_)
+    path = mirror_path(load_config())
+    if not path.exists():
+        err_style.echo(f"No mirror at {path}, run trellod sync first")
+        raise typer.Exit(ExitCode.NOT_FOUND)
+
+    with Mirror(path) as mirror:
+        if board:
+            board_id = mirror.find_board(board)
+            if board_id is None:
+                err_style.echo(f"{board} is not in the mirror")
+                raise typer.Exit(ExitCode.NOT_FOUND)
+        else:
+            boards = mirror.boards()
+            index = pick(
+                [name for _, name in boards], prompt="Select Board", style=style
+            )
+            if index is None:
+                return
+            board_id = boards[index][0]
+        trello_board = filtered(mirror.load_board(board_id), card_filter)
+
+    filename = output or Path(f"Trello {trello_board.name.strip()}{exporter.extension}")
+    exporter.write(str(filename), trello_board.lists, export_columns)
+    style.echo(f"Exported {trello_board.name} from {path} to {filename}")
+
+
+def convert(
+    path: Path = typer.Argument(..., help='Trello "Export as JSON" file'),
+    output: Path = typer.Option(None, help="Output file [default: Trello <board>]"),
+    format_: str = typer.Option(
+        "xlsx", "--format", help=f"Output format: {', '.join(EXPORTERS)}"
+    ),
+    columns: str = typer.Option(
+        None, help=f"Comma separated columns to export: {', '.join(COLUMNS)}"
+    ),
+    filter_: List[str] = typer.Option(
+        [],
+        "--filter",
+        "-f",
+        help="Card filter term, repeatable: list=, label=, member=, "
+        "due>=, due<, activity>=, activity< or state=open|archived|all",
+    ),
+) -> None:
+    """ Write a board from a Trello json export, without credentials or network """
+    # pylint: disable=import-outside-toplevel
+    from trellod.trello_json import read_board_export
+
+    exporter = exporter_for(format_)
+    export_columns = columns_for(columns) or exporter.columns
+    card_filter = filter_for(filter_)
+    try:
+        board = read_board_export(path)
+    except (OSError, ValueError) as error:  # JSONDecodeError is a ValueError
+        err_style.echo(f"Cannot read {path}: {error}")
+        raise typer.Exit(ExitCode.FAILED) from error
+
+    board = filtered(board, card_filter)
+    filename = output or Path(f"Trello {board.name.strip()}{exporter.extension}")
+    exporter.write(str(filename), board.lists, export_columns)
+    style.echo(f"Converted {board.name} from {path} to {filename}")
+
+
+def search(
+    query: str = typer.Argument(..., help="Words to find, the last one as a prefix"),
+    board: str = typer.Option(None, "--board", "-b", help="Board name or id"),
+    limit: int = typer.Option(20, help="Maximum number of cards to show"),
+    raw: bool = typer.Option(False, "--raw", help="Query is in FTS5 query syntax"),
+) -> None:
+    """ Find cards of dumped boards in the local full-text index """
+    # pylint: disable=import-outside-toplevel
+    import sqlite3
+
+    from trellod.search import SearchIndex
+
+    path = search_path(load_config())
+    if not path.exists():
+        err_style.echo(f"No search index at {path}, dump a board first")
+        raise typer.Exit(ExitCode.NOT_FOUND)
+
+    start = time.perf_counter()
+    with SearchIndex(path) as index:
+        try:
+            hits = index.search(query, limit, board, raw)
+        except sqlite3.OperationalError as error:
+            raise typer.BadParameter(str(error), param_hint="QUERY") from error
+    for hit in hits:
+        style.echo(str(hit))
+    style.echo(f"{len(hits)} cards in {(time.perf_counter() - start) * 1000:.1f} ms")
+    if not hits:
+        raise typer.Exit(ExitCode.NOT_FOUND)
+
+
+def serve(
+    schedule: Path = typer.Option(
+        None, help="Schedule yaml file [default: trellod.serve.yaml by the config]"
+    ),
+    workers: int = typer.Option(
+        DEFAULT_WORKERS, help="Number of concurrent Trello requests"
+    ),
+    dumps: int = typer.Option(2, help="Number of boards dumped at once"),
+    webhook_port: int = typer.Option(
+        None, help="Receive Trello webhooks on this port [default: off]"
+    ),
+    webhook_host: str = typer.Option("127.0.0.1", help="Address for webhooks"),
+    callback_url: str = typer.Option(
+        None, help="Public url the webhooks were registered with"
+    ),
+    debounce: float = typer.Option(
+        2.0, help="Seconds a board must be quiet before a webhook refresh"
+    ),
+) -> None:
+    """ Dump boards on a schedule and on request over a local socket """
+    # pylint: disable=import-outside-toplevel
+    import signal
+
+    from trellod.api import TrelloApi
+    from trellod.daemon import Daemon, SocketServer, load_schedule
+    from trellod.transport import Transport
+
+    if webhook_port is not None and not callback_url:
+        raise typer.BadParameter(
+            "webhooks are signed with their callback url", param_hint="--callback-url"
+        )
+    config, client = connect(Transport(pool_size=workers))
+    schedule_path = schedule or config.path.parent / "trellod.serve.yaml"
+    try:
+        plan = load_schedule(schedule_path)
+    except (OSError, ValueError, KeyError) as error:
+        err_style.echo(f"Cannot load schedule {schedule_path}: {error}")
+        raise typer.Exit(ExitCode.FAILED) from error
+
+    daemon = Daemon(
+        TrelloApi(client),
+        plan,
+        workers,
+        dumps,
+        search_path(config),
+        config.path.parent / "snapshots",
+    )
+    try:
+        server = SocketServer(socket_path(config), daemon).start()
+    except RuntimeError as error:
+        err_style.echo(str(error))
+        raise typer.Exit(ExitCode.FAILED) from error
+    receiver = None
+    if webhook_port is not None:
+        receiver = daemon.webhooks(
+            (webhook_host, webhook_port), config.api_secret, callback_url, debounce
+        )
+        style.echo(f"Webhooks for {callback_url} on {receiver.url}")
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    style.echo(
+        f"Serving {len(plan.jobs)} scheduled boards to {plan.output_dir}, "
+        f"requests on {server.path}"
+    )
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if receiver is not None:
+            receiver.stop()
+        server.stop()
+        daemon.close()
+    style.echo(f"Stopped after {daemon.api.request_count} Trello requests")
+
+
+def trigger(
+    board: str = typer.Argument(None, help="Board name or id to dump"),
+    format_: str = typer.Option(
+        None, "--format", help=f"Output format: {', '.join(EXPORTERS)}"
+    ),
+    force: bool = typer.Option(False, "--force", help="Dump even if unchanged"),
+    status: bool = typer.Option(False, "--status", help="Show the daemon's status"),
+    stop: bool = typer.Option(False, "--stop", help="Stop the daemon"),
+) -> None:
+    """ Ask a running trellod serve to dump a board now """
+    from trellod.daemon import send  # pylint: disable=import-outside-toplevel
+
+    if status:
+        message = dict(command="status")
+    elif stop:
+        message = dict(command="stop")
+    elif board:
+        message = dict(command="dump", board=board, format=format_, force=force)
+    else:
+        raise typer.BadParameter("give a board, --status or --stop")
+
+    path = socket_path(load_config())
+    try:
+        response = send(path, message)
+    except OSError as error:
+        err_style.echo(f"No trellod serve on {path}: {error}")
+        raise typer.Exit(ExitCode.FAILED) from error
+
+    if not response.get("ok"):
+        err_style.echo(response.get("error", "failed"))
+        raise typer.Exit(ExitCode.FAILED)
+    if status:
+        for line in response["history"]:
+            style.echo(str(line))
+        style.echo(f"{len(response['jobs'])} jobs, {response['requests']} requests")
+    elif board:
+        style.echo(
+            f"{response['board']} unchanged since its last dump"
+            if response["skipped"]
+            else f"Dumped {response['board']} to {response['path']} "
+            f"using {response['requests']} requests"
+        )
 
-    filename = f"Trello {board.name.strip()}.xlsx"
-    dump_trello(filename, lists)
-    # download_images_in_lists(lists)
 
-    webbrowser.open(f"file://{Path(filename).resolve()}")
+def main() -> None:
+    """ trellod entry point """
+    run(cli, batch, sync, export, convert, search, serve, trigger)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+
+"""
+Trello webhook receiver
+
+Trello POSTs each action on a watched board to the webhook's callback url,
+signed in the X-Trello-Webhook header with base64(HMAC-SHA1(app secret,
+body + callback url)).  WebhookServer checks the signature and hands the
+action to a Debouncer, which collects a burst of actions per board and
+passes them on once the board has been quiet for a moment, so a burst of
+edits costs one refresh.  The refresh itself fetches only the cards the
+actions touch (trellod.snapshot.apply_actions).
+
+Webhooks are registered with POST /1/webhooks (idModel, callbackURL);
+Trello checks the callback url with a HEAD request first.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+MAX_BODY = 1 << 20  # Trello actions are a few KB
+
+
+def signature(secret: str, body: bytes, callback_url: str) -> str:
+    """ Value of the X-Trello-Webhook header Trello sends with body """
+    digest = hmac.new(
+        secret.encode(), body + callback_url.encode(), hashlib.sha1
+    ).digest()
+    return base64.b64encode(digest).decode()
+
+
+def verify(secret: str, body: bytes, callback_url: str, header: str) -> bool:
+    """ Whether header is Trello's signature of body """
+    return hmac.compare_digest(signature(secret, body, callback_url), header or "")
+
+
+def board_id(payload: dict) -> Optional[str]:
+    """ Id of the board a webhook payload is about """
+    board = payload.get("action", {}).get("data", {}).get("board", {})
+    return board.get("id") or payload.get("model", {}).get("id")
+
+
+class Debouncer:
+    """
+    Collect events per key and call flush(key, events) once they go quiet
+
+    flush runs delay seconds after the last event of a key, or max_delay
+    seconds after its first event, whichever is sooner.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[str, List[dict]], None],
+        delay: float = 2.0,
+        max_delay: float = 30.0,
+    ):
+        self.flush = flush
+        self.delay = delay
+        self.max_delay = max_delay
+        self.pending: Dict[str, list] = {}  # key: [first time, events, timer]
+        self.lock = threading.Lock()
+
+    def add(self, key: str, event: dict) -> None:
+        """ Add an event of key, postponing its flush """
+        now = time.monotonic()
+        with self.lock:
+            entry = self.pending.setdefault(key, [now, [], None])
+            entry[1].append(event)
+            if entry[2] is not None:
+                entry[2].cancel()
+            wait = min(self.delay, max(0.0, entry[0] + self.max_delay - now))
+            entry[2] = threading.Timer(wait, self._fire, (key,))
+            entry[2].daemon = True
+            entry[2].start()
+
+    def _fire(self, key: str) -> None:
+        with self.lock:
+            entry = self.pending.pop(key, None)
+        if entry is not None:
+            self.flush(key, entry[1])
+
+    def close(self) -> None:
+        """ Flush every pending key now """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for key, (_, events, timer) in pending.items():
+            timer.cancel()
+            self.flush(key, events)
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """ Accept signed Trello webhook callbacks """
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        """ Trello checks the callback url with a HEAD before creating a webhook """
+        self.send_response(200)
+        self.end_headers()
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """ Verify a callback and queue its action for its board """
+
+        server: WebhookServer = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            self.reply(413)
+            return
+        body = self.rfile.read(length)
+        header = self.headers.get("X-Trello-Webhook", "")
+        if not verify(server.secret, body, server.callback_url, header):
+            server.count("rejected")
+            self.reply(401)
+            return
+        try:
+            payload = json.loads(body)
+            board, action = board_id(payload), payload.get("action")
+        except (ValueError, AttributeError):
+            board = action = None
+        if board is None or action is None:
+            self.reply(400)
+            return
+        server.count("accepted")
+        server.debouncer.add(board, action)
+        self.reply(200)
+
+    def reply(self, status: int) -> None:
+        """ Send an empty response """
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """ Local HTTP endpoint for Trello webhooks, reached through a proxy or tunnel """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple,
+        secret: str,
+        callback_url: str,
+        debouncer: Debouncer,
+    ):
+        super().__init__(address, WebhookHandler)
+        self.secret = secret
+        self.callback_url = callback_url
+        self.debouncer = debouncer
+        self.counts = dict(accepted=0, rejected=0)
+        self.lock = threading.Lock()
+
+    def count(self, name: str) -> None:
+        """ Count an accepted or rejected callback """
+        with self.lock:
+            self.counts[name] += 1
+
+    @property
+    def url(self) -> str:
+        """ Base url the server listens on """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "WebhookServer":
+        """ Serve on a background thread """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """ Stop serving, then flush the debounced actions """
+        self.shutdown()
+        self.server_close()
+        self.debouncer.close()
+
+
+def demo():
+    """ Replay a burst of edits from the stub server and show the one refresh """
+
+    # pylint: disable=import-outside-toplevel
+    import tempfile
+    from pathlib import Path
+
+    from trello import TrelloClient
+
+    from trellod.api import TrelloApi
+    from trellod.daemon import Daemon, Schedule
+    from trellod.stub_server import StubTrello, replay_webhooks, webhook_payloads
+
+    folder = Path(tempfile.mkdtemp())
+    with StubTrello() as server:
+        server.add_board(board_id="demo", num_lists=5, num_cards=2000)
+        api = TrelloApi(TrelloClient(api_key="key"), base_url=server.api_url)
+        daemon = Daemon(
+            api, Schedule(folder, "csv", []), snapshots=folder / "snapshots"
+        )
+        daemon.dump(daemon.resolve("demo"), "csv")
+        full = api.request_count
+
+        receiver = daemon.webhooks(("127.0.0.1", 0), "secret", "", delay=0.5)
+        receiver.callback_url = f"{receiver.url}/trello"
+        for index in range(20):
+            server.update_card("demo", f"democ{index % 3}", name=f"Edit {index}")
+        statuses = replay_webhooks(
+            receiver.callback_url, webhook_payloads(server, "demo"), "secret"
+        )
+        time.sleep(1.0)
+        receiver.stop()
+        daemon.close()
+
+    print(f"full dump: {full} requests")
+    print(f"{len(statuses)} webhooks, status {set(statuses)}: {receiver.counts}")
+    for result in daemon.history[1:]:
+        print(result)
+
+
+if __name__ == "__main__":
+    demo()